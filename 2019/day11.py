@@ -2,13 +2,14 @@
 https://adventofcode.com/2019/day/11
 """
 
-from collections import defaultdict
-import math
+import sys
+import time
+import tracemalloc
 
-# Constants for Intcode computer modes
-POSITION_MODE = 0
-IMMEDIATE_MODE = 1
-RELATIVE_MODE = 2
+from intcode import STATUS_HALT, STATUS_INPUT, Computer, NeedInput
+from intcode_binary import load_program
+from intcode_jit import CompiledComputer
+from render import crop, to_text, write_image
 
 # Constants for input values
 COLOR_BLACK = 0
@@ -18,196 +19,163 @@ COLOR_WHITE = 1
 TURN_LEFT = 0
 TURN_RIGHT = 1
 
-
-class Computer:
-    """An Intcode computer that can run a program."""
-
-    def __init__(self, program):
-        # program is converted from list of integers to a {index -> integer}
-        # map to support arbitrary memory assignment
-        # (e.g. writing to position 1mil without the associated 0's in memory)
-        self.program = {i: v for i, v in enumerate(program)}
-        self.inputs = []
-        self.outputs = []
-        self.index = 0
-        self.halted = False
-        self.relative_base = 0
-
-    def get_address(self, index, mode):
-        """Get the absolute index referenced by a relative index and a mode."""
-        if mode == IMMEDIATE_MODE:
-            return index
-        elif mode == POSITION_MODE:
-            return self.program[index]
-        elif mode == RELATIVE_MODE:
-            return self.program[index] + self.relative_base
-        raise Exception(f"unknown mode: {mode}")
-
-    def get_value(self, index, mode):
-        """Return a value from a program by relative index and mode."""
-        address = self.get_address(index, mode)
-        try:
-            return self.program[address]
-        except KeyError:
-            return 0
-
-    def set_value(self, index, mode, value):
-        """Set a value into the program by relative index and mode."""
-        address = self.get_address(index, mode)
-        self.program[address] = value
-
-    def process(self):
-        """Run an Intcode program. Modifiy the program in-place as needed.
-        Returns an output when it encounters Opcode 4.
-        Uses the `inputs` attribute to support Opcode 3.
-            - Each encounter of opcode 3 will remove an element from the inputs
-        """
-        while not self.halted:
-            self.step()
-        return self.outputs
-
-    def step(self):
-        """Run a single step of the intcode program."""
-        # parse opcode and parameter mode(s) from instruction
-        # (convert integer into 5-digit string with zeroes before parsing)
-        instruction = str(self.program[self.index]).zfill(5)
-        opcode = int(instruction[-2:])
-        param1_mode = int(instruction[-3])
-        param2_mode = int(instruction[-4])
-        param3_mode = int(instruction[-5])
-
-        # opcode to halt program
-        if opcode == 99:
-            self.halted = True
-            return
-
-        # opcodes for addition or multiplication
-        if opcode in (1, 2):
-            val1 = self.get_value(self.index + 1, param1_mode)
-            val2 = self.get_value(self.index + 2, param2_mode)
-
-            if opcode == 1:
-                total = val1 + val2
-            elif opcode == 2:
-                total = val1 * val2
-
-            self.set_value(self.index + 3, param3_mode, total)
-            self.index += 4
-            return
-
-        # opcode for input
-        if opcode == 3:
-            try:
-                inputval = self.inputs.pop(0)
-            except IndexError:
-                # no input available, halt program until external process
-                # adds input and restarts the process
-                self.halted = True
-                return
-
-            self.set_value(self.index + 1, param1_mode, inputval)
-            self.index += 2
-            return
-
-        # opcode for output
-        if opcode == 4:
-            self.outputs += [self.get_value(self.index + 1, param1_mode)]
-            self.index += 2
-            return
-
-        # opcodes for jump-if-true / jump-if-false
-        if opcode in (5, 6):
-            val1 = self.get_value(self.index + 1, param1_mode)
-            val2 = self.get_value(self.index + 2, param2_mode)
-
-            # Should jump; update instruction pointer directly
-            if (opcode == 5 and val1 != 0) or (opcode == 6 and val1 == 0):
-                self.index = val2
-                return
-
-            # No action, continue to next instruction
-            self.index += 3
-            return
-
-        # opcode for less than / equal to
-        if opcode in (7, 8):
-            val1 = self.get_value(self.index + 1, param1_mode)
-            val2 = self.get_value(self.index + 2, param2_mode)
-
-            # Default 0 (False), set to 1 if True
-            result = 0
-            if opcode == 7 and val1 < val2:
-                result = 1
-            elif opcode == 8 and val1 == val2:
-                result = 1
-
-            self.set_value(self.index + 3, param3_mode, result)
-            self.index += 4
-            return
-
-        # opcode for relative base offset
-        if opcode == 9:
-            self.relative_base += self.get_value(self.index + 1, param1_mode)
-            self.index += 2
-            return
-
-        raise Exception("unknown opcode, something went wrong")
-
-
-def run_robot(program):
+# (x, y) steps of each direction in turn going left: up, left, down, right
+DIRECTIONS = [(0, 1), (-1, 0), (0, -1), (1, 0)]
+
+# Bit set on panels that have been painted at least once
+PAINTED = 2
+COLOR_MASK = 1
+
+# Characters panels are drawn with, whether painted or not
+ICONS = {0: " ", 1: "X", PAINTED: " ", PAINTED | 1: "X"}
+# Panels drawn black in images
+INK = {COLOR_WHITE, PAINTED | COLOR_WHITE}
+
+
+class PanelGrid:
+    """Colors of panels kept in one bytearray of rows, indexed from an offset.
+
+    Doubles in size whenever the robot leaves it, and keeps the bounds of
+    the panels painted and how many have been painted as they change.
+    """
+
+    def __init__(self, size=16):
+        self.cells = bytearray(size * size)
+        # Position of the first cell, and size, of the area stored
+        self.left = self.bottom = -(size // 2)
+        self.width = self.height = size
+        self.bounds = None  # (min_x, min_y, max_x, max_y) of painted panels
+        self.painted = 0  # panels painted at least once
+
+    def __getitem__(self, position):
+        x, y = position
+        column = x - self.left
+        row = y - self.bottom
+        if 0 <= column < self.width and 0 <= row < self.height:
+            return self.cells[row * self.width + column] & COLOR_MASK
+        return COLOR_BLACK
+
+    def paint(self, x, y, color):
+        """Paint the panel at (x, y) a color."""
+        column = x - self.left
+        row = y - self.bottom
+        if not (0 <= column < self.width and 0 <= row < self.height):
+            self.grow(x, y)
+            column = x - self.left
+            row = y - self.bottom
+
+        index = row * self.width + column
+        if not self.cells[index] & PAINTED:
+            self.painted += 1
+            if self.bounds is None:
+                self.bounds = (x, y, x, y)
+            else:
+                min_x, min_y, max_x, max_y = self.bounds
+                self.bounds = (
+                    min(min_x, x),
+                    min(min_y, y),
+                    max(max_x, x),
+                    max(max_y, y),
+                )
+        self.cells[index] = color | PAINTED
+
+    def grow(self, x, y):
+        """Store twice the area on each side (x, y) is past, until it fits."""
+        left, bottom, width, height = self.left, self.bottom, self.width, self.height
+        while x < left:
+            left -= width
+            width *= 2
+        while x >= left + width:
+            width *= 2
+        while y < bottom:
+            bottom -= height
+            height *= 2
+        while y >= bottom + height:
+            height *= 2
+
+        cells = bytearray(width * height)
+        shift = self.left - left
+        for row in range(self.height):
+            start = (row + self.bottom - bottom) * width + shift
+            old = row * self.width
+            cells[start : start + self.width] = self.cells[old : old + self.width]
+        self.cells = cells
+        self.left, self.bottom, self.width, self.height = left, bottom, width, height
+
+
+def run_robot(program, start_color=COLOR_WHITE):
+    """Return the PanelGrid a robot run by a program paints."""
     # All panels start black, and robot starts at origin facing up
-    grid = defaultdict(lambda: COLOR_BLACK)
-    position = (0, 0)
-    direction = 90
-    computer = Computer(program)
-    current_color = COLOR_WHITE
+    grid = PanelGrid()
+    x, y = 0, 0
+    direction = 0
+    computer = CompiledComputer(program)
+    current_color = start_color
     while not computer.halted:
         computer.inputs += [current_color]
         # Run program until two outputs are generated
-        while len(computer.outputs) != 2:
-            if computer.halted:
-                return grid
-            computer.step()
+        status = computer.run_until_outputs(2)
+        if status == STATUS_HALT:
+            return grid
+        if status == STATUS_INPUT:
+            raise NeedInput()
 
         # Pop the outputs for processing
         color, turn = computer.outputs
         computer.outputs = []
 
         # Paint the current panel
-        grid[position] = color
+        grid.paint(x, y, color)
 
         # Move the robot
         if turn == TURN_LEFT:
-            direction += 90
+            direction = (direction + 1) % 4
         elif turn == TURN_RIGHT:
-            direction -= 90
+            direction = (direction - 1) % 4
         else:
-            raise Exception(f"unknown direction: {direction}")
+            raise Exception(f"unknown direction: {turn}")
+
+        step_x, step_y = DIRECTIONS[direction]
+        x += step_x
+        y += step_y
+        current_color = grid[(x, y)]
+    return grid
 
-        x = round(math.cos(math.radians(direction)))
-        y = round(math.sin(math.radians(direction)))
-        position = (position[0] + x, position[1] + y)
-        current_color = grid[position]
+
+def ant_program(moves):
+    """Return a program for a robot that moves like Langton's ant: on black it
+    paints white and turns left, on white it paints black and turns right.
+    """
+    program = [3, 100, 1008, 100, 0, 101, 4, 101, 4, 100, 1001, 102, -1, 102]
+    program += [1005, 102, 0, 99] + [0] * 82
+    return program + [0, 0, moves]
 
 
 def print_grid(grid):
-    """Print a map of (x, y) -> color to the console."""
-    # Calculate offsets for printing potentially negative range
-    min_x = min(grid, key=lambda item: item[0])[0]
-    min_y = min(grid, key=lambda item: item[1])[1]
-    max_x = max(grid, key=lambda item: item[0])[0]
-    max_y = max(grid, key=lambda item: item[1])[1]
-
-    # Loop over grid adjusting for flipped Y perspective
-    for y in range(max_y, min_y - 1, -1):
-        row = ""
-        for x in range(min_x, max_x + 1):
-            color = grid[(x, y)]
-            if color == COLOR_BLACK:
-                row += " "
-            else:
-                row += "X"
-        print(row)
+    """Print a PanelGrid to the console."""
+    print(to_text(crop(grid), ICONS))
+
+
+def benchmark(moves=20000):
+    """Print how fast the robot moves, and how much memory its grid takes,
+    for a robot that moves like Langton's ant.
+    """
+    program = ant_program(moves)
+    elapsed = None
+    for _ in range(3):
+        start = time.perf_counter()
+        run_robot(program, COLOR_BLACK)
+        took = time.perf_counter() - start
+        elapsed = took if elapsed is None else min(elapsed, took)
+
+    tracemalloc.start()
+    grid = run_robot(program, COLOR_BLACK)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(
+        f"{moves / elapsed:.0f} moves/s, "
+        f"grid of {size / 1024:.1f}KiB for {grid.painted} panels"
+    )
 
 
 def test():
@@ -228,16 +196,62 @@ def test():
     output = Computer(program).process()
     assert output[0] == 1125899906842624
 
-
-def main():
-    # Convert the text program into a list of integers (Intcode)
-    with open("data/day11.txt", "r") as file:
-        text = file.read().strip()
-    program = [int(number) for number in text.split(",")]
+    # the example robot from the puzzle, which paints 6 panels
+    outputs = [1, 0, 0, 0, 1, 0, 1, 0, 0, 1, 1, 0, 1, 0]
+    program = []
+    for color, turn in zip(outputs[::2], outputs[1::2]):
+        program += [3, 100, 104, color, 104, turn]
+    program += [99]
+    grid = run_robot(program, COLOR_BLACK)
+    assert grid.painted == 6
+    assert grid.bounds == (-1, -1, 1, 1)
+    assert [grid[(0, 0)], grid[(-1, 0)], grid[(1, 0)]] == [0, 0, 1]
+
+    assert to_text(crop(grid), ICONS) == "  X\n  X\nXX "
+
+    # panels far from the start grow the grid in every direction
+    grid = PanelGrid(size=2)
+    for x, y in [(5, 0), (-9, 3), (0, -40), (2, 70)]:
+        grid.paint(x, y, COLOR_WHITE)
+    grid.paint(5, 0, COLOR_BLACK)
+    assert grid.painted == 4 and grid.bounds == (-9, -40, 5, 70)
+    assert [grid[(5, 0)], grid[(-9, 3)], grid[(0, -40)], grid[(2, 70)]] == [0, 1, 1, 1]
+
+    # the robot paints the same as Langton's ant, over 11000 moves
+    program = ant_program(11000)
+    grid = run_robot(program, COLOR_BLACK)
+    painted = set()
+    x, y, step_x, step_y = 0, 0, 0, 1
+    for _ in range(11000):
+        if (x, y) in painted:
+            painted.remove((x, y))
+            step_x, step_y = step_y, -step_x
+        else:
+            painted.add((x, y))
+            step_x, step_y = -step_y, step_x
+        x += step_x
+        y += step_y
+    min_x, min_y, max_x, max_y = grid.bounds
+    assert painted == {
+        (x, y)
+        for x in range(min_x, max_x + 1)
+        for y in range(min_y, max_y + 1)
+        if grid[(x, y)]
+    }
+
+
+def main(image_path=None):
+    # Load the program, from its compiled copy if there is one
+    program = load_program("data/day11.txt")
     grid = run_robot(program)
     print_grid(grid)
+    if image_path is not None:
+        write_image(image_path, crop(grid), INK)
 
 
 if __name__ == "__main__":
     test()
-    main()
+    if sys.argv[1:2] == ["--benchmark"]:
+        benchmark(*[int(value) for value in sys.argv[2:3]])
+    else:
+        main(*sys.argv[1:2])
@@ -2,10 +2,14 @@
 https://adventofcode.com/2019/day/12
 """
 
+from concurrent.futures import ProcessPoolExecutor
 from functools import reduce
 from itertools import combinations
 from math import gcd
+import random
 import re
+import sys
+import time
 from typing import List
 
 INPUT = """
@@ -15,6 +19,11 @@ INPUT = """
     <x=3, y=7, z=-4>
 """
 
+# Seconds between progress reports of each dimension searched for a cycle,
+# checked every PROGRESS_STEPS steps
+PROGRESS_SECONDS = 5.0
+PROGRESS_STEPS = 1 << 14
+
 
 class Body:
     def __init__(self, position, velocity=None):
@@ -39,8 +48,12 @@ class Body:
 
 
 class Simulation:
+    # Function counting the pull on each body, for backends with arrays
+    gravity = None
+
     def __init__(self, starts: List[list]):
-        self.bodies = [Body(start) for start in starts]
+        # Copied, so stepping never changes the start positions given
+        self.bodies = [Body(list(start)) for start in starts]
 
     def stepn(self, n):
         for _ in range(n):
@@ -76,23 +89,245 @@ class Simulation:
 
         As an optimization, find the repetition cycle of each dimension
         indepently, then the total is the LCM of all dimensional cycles.
+        The simulation isn't stepped.
         """
         dim_steps = {}
         for dimension in range(3):
             # Find steps before repeat for this dimension
-            start = hash(tuple(self.bodies))
-            index = 0
-            while True:
-                self.step_dimension(dimension)
-                index += 1
-                if hash(tuple(self.bodies)) == start:
-                    dim_steps[dimension] = index
-                    print(f"dim {dimension} repeats in {index}")
-                    break
+            state = self.axis_state(dimension)
+            period, _, _ = axis_period(*state, dimension, self.gravity)
+            dim_steps[dimension] = period
+            print(f"dim {dimension} repeats in {period}")
+
+        return lcm(dim_steps.values())
 
+    def axis_state(self, dim):
+        """Return copies of the positions and velocities in one dimension."""
+        positions = [body.position[dim] for body in self.bodies]
+        velocities = [body.velocity[dim] for body in self.bodies]
+        return positions, velocities
+
+    def steps_until_repeat_parallel(self, workers=3, report_every=PROGRESS_SECONDS):
+        """Find the same step as steps_until_repeat, searching for the cycle
+        of each dimension in its own process. The simulation isn't stepped.
+        """
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(
+                    axis_period, *self.axis_state(dim), dim, self.gravity, report_every
+                )
+                for dim in range(3)
+            ]
+            dim_steps = {}
+            for dim, future in enumerate(futures):
+                period, steps, seconds = future.result()
+                dim_steps[dim] = period
+                rate = steps / max(seconds, 1e-9)
+                print(f"dim {dim} repeats in {period} ({rate:.0f} steps/s)")
         return lcm(dim_steps.values())
 
 
+class ArraySimulation(Simulation):
+    """The same simulation with positions and velocities held as (n, 3)
+    NumPy arrays, so each step is a few operations over all the bodies.
+
+    `gravity` picks how the pull on each body is counted: "broadcast"
+    compares every pair of bodies, O(n^2) in C, and "sort"
+    counts the bodies above and below each one in a sorted copy, O(n log n).
+    """
+
+    def __init__(self, starts: List[list], gravity="sort"):
+        # Imported here so the rest of this day runs without NumPy
+        import numpy as np
+
+        if gravity not in GRAVITY:
+            raise Exception(f"unknown gravity method: {gravity}")
+        self.gravity = GRAVITY[gravity]
+        self.positions = np.array(starts, dtype=np.int64).reshape(-1, 3)
+        self.velocities = np.zeros_like(self.positions)
+
+    @property
+    def bodies(self):
+        """Return the state as Body objects, to compare with Simulation."""
+        return [
+            Body(position.tolist(), velocity.tolist())
+            for position, velocity in zip(self.positions, self.velocities)
+        ]
+
+    def step(self):
+        """Run a single step of the simulation in every dimension at once."""
+        self.velocities += self.gravity(self.positions)
+        self.positions += self.velocities
+
+    def step_dimension(self, dim):
+        """Run a single step of the simulation in one dimension (0, 1, 2)."""
+        self.velocities[:, dim] += self.gravity(self.positions[:, dim])
+        self.positions[:, dim] += self.velocities[:, dim]
+
+    def total_energy(self):
+        """Return the total energy in the system."""
+        potential = abs(self.positions).sum(axis=1)
+        kinetic = abs(self.velocities).sum(axis=1)
+        return int((potential * kinetic).sum())
+
+    def axis_state(self, dim):
+        """Return copies of the positions and velocities in one dimension."""
+        return self.positions[:, dim].copy(), self.velocities[:, dim].copy()
+
+
+def axis_period(positions, velocities, dim, gravity=None, report_every=None):
+    """Return (period, steps, seconds) for one dimension of a simulation to
+    first come back to its start, printing progress every `report_every`
+    seconds. `steps` may be half the period, as below.
+
+    Only that dimension's positions and velocities are stepped: as lists in
+    Python when gravity is None, or else packed into one array with a
+    gravity function of ArraySimulation. Each step compares them with the
+    start exactly, without building a state tuple or bytes to compare.
+
+    Steps can be run backwards, and from a state with every velocity zero
+    they go the same both ways. So when the start has every velocity zero,
+    the first step k to also have them all zero is halfway round: the
+    period is k if the positions are back at the start, or else 2k.
+    """
+    count = len(positions)
+    if gravity is None:
+        positions = list(positions)
+        velocities = list(velocities)
+        pairs = list(combinations(range(count), 2))
+        start_positions = list(positions)
+        start_velocities = list(velocities)
+        zeros = [0] * count
+
+        def step():
+            for i, j in pairs:
+                if positions[i] < positions[j]:
+                    velocities[i] += 1
+                    velocities[j] -= 1
+                elif positions[i] > positions[j]:
+                    velocities[i] -= 1
+                    velocities[j] += 1
+            for i, velocity in enumerate(velocities):
+                positions[i] += velocity
+
+        def at_start():
+            return velocities == start_velocities and positions == start_positions
+
+        def at_rest():
+            return velocities == zeros
+
+        def positions_at_start():
+            return positions == start_positions
+
+    else:
+        import numpy as np
+
+        # Positions then velocities, compared with the start into `same`
+        state = np.concatenate([positions, velocities]).astype(np.int64)
+        positions, velocities = state[:count], state[count:]
+        start = state.copy()
+        same = np.empty(len(state), dtype=bool)
+
+        def step():
+            velocities[:] += gravity(positions)
+            positions[:] += velocities
+
+        def at_start():
+            np.equal(state, start, out=same)
+            return same.all()
+
+        def at_rest():
+            return not velocities.any()
+
+        def positions_at_start():
+            np.equal(state, start, out=same)
+            return same[:count].all()
+
+    half = at_rest()
+    started = reported = time.perf_counter()
+    steps = 0
+    while True:
+        step()
+        steps += 1
+        if half:
+            if at_rest():
+                period = steps if positions_at_start() else 2 * steps
+                return period, steps, time.perf_counter() - started
+        elif at_start():
+            return steps, steps, time.perf_counter() - started
+        if report_every is not None and steps % PROGRESS_STEPS == 0:
+            now = time.perf_counter()
+            if now - reported >= report_every:
+                rate = steps / (now - started)
+                print(f"dim {dim}: {steps} steps, {rate:.0f} steps/s", flush=True)
+                reported = now
+
+
+def gravity_broadcast(positions):
+    """Return the change in velocity of each body from every other, for
+    positions of shape (n,) or (n, 3), comparing every pair of bodies.
+    Rows are compared a chunk at a time so the pairs never take more than
+    BROADCAST_CELLS booleans at once.
+    """
+    import numpy as np
+
+    if positions.ndim > 1:
+        return np.stack([gravity_broadcast(column) for column in positions.T], axis=1)
+    pull = np.empty_like(positions)
+    chunk = max(1, BROADCAST_CELLS // max(len(positions), 1))
+    for start in range(0, len(positions), chunk):
+        rows = positions[start : start + chunk, np.newaxis]
+        above = np.count_nonzero(positions > rows, axis=1)
+        below = np.count_nonzero(positions < rows, axis=1)
+        pull[start : start + chunk] = above - below
+    return pull
+
+
+def gravity_sort(positions):
+    """Return the change in velocity of each body from every other, for
+    positions of shape (n,) or (n, 3). Each body is pulled up by the bodies
+    above it and down by those below, counted by searching a sorted copy.
+    """
+    import numpy as np
+
+    if positions.ndim > 1:
+        return np.stack([gravity_sort(column) for column in positions.T], axis=1)
+    ordered = np.sort(positions)
+    below = np.searchsorted(ordered, positions, side="left")
+    above = len(positions) - np.searchsorted(ordered, positions, side="right")
+    return above - below
+
+
+# Most pairs of bodies gravity_broadcast compares at once
+BROADCAST_CELLS = 1 << 22
+
+# Ways ArraySimulation can count the pull on each body
+GRAVITY = {"broadcast": gravity_broadcast, "sort": gravity_sort}
+
+# Backends for make_simulation: bodies in Python, or arrays by gravity method
+BACKENDS = ["bodies"] + list(GRAVITY)
+
+
+def available_backends():
+    """Return the backends that can run here, as only "bodies" runs without
+    NumPy.
+    """
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return BACKENDS[:1]
+    return BACKENDS
+
+
+def make_simulation(starts: List[list], backend="bodies") -> Simulation:
+    """Return a simulation of some start positions on a backend."""
+    if backend == "bodies":
+        return Simulation(starts)
+    if backend in GRAVITY:
+        return ArraySimulation(starts, gravity=backend)
+    raise Exception(f"unknown simulation backend: {backend}")
+
+
 def lcm(denoms):
     """Return the Least Common Multiple of a set of integers."""
     return reduce(lambda a, b: a * b // gcd(a, b), denoms)
@@ -240,15 +475,95 @@ def test2():
     sim = Simulation(starts)
     assert sim.steps_until_repeat() == 4686774924
 
+    # Each dimension can be searched in its own process, on either backend
+    for backend in ("bodies", "sort"):
+        if backend not in available_backends():
+            continue
+        sim = make_simulation(starts, backend)
+        assert sim.steps_until_repeat_parallel() == 4686774924
+
 
-def main():
+def test_backends():
+    starts = parse_start_positions(
+        """
+        <x=-1, y=0, z=2>
+        <x=2, y=-10, z=-7>
+        <x=4, y=-8, z=8>
+        <x=3, y=5, z=-1>
+    """
+    )
+    # The array backends are only checked where NumPy is installed
+    backends = available_backends()
+    for backend in backends[1:]:
+        sim = make_simulation(starts, backend)
+        sim.stepn(10)
+        assert sim.total_energy() == 179
+        assert make_simulation(starts, backend).steps_until_repeat() == 2772
+
+    # Every backend steps many bodies, with ties, through the same states
+    rng = random.Random(12)
+    starts = [[rng.randint(-20, 20) for _ in range(3)] for _ in range(60)]
+    sims = [make_simulation(starts, backend) for backend in backends]
+    for _ in range(25):
+        for sim in sims:
+            sim.step()
+        assert all(sim.bodies == sims[0].bodies for sim in sims)
+    for sim in sims:
+        sim.step_dimension(1)
+    assert all(sim.bodies == sims[0].bodies for sim in sims)
+    assert len({sim.total_energy() for sim in sims}) == 1
+
+    # Starting at rest, the search stops halfway at the next rest
+    for gravity in [None] + [GRAVITY[backend] for backend in backends[1:]]:
+        # Two bodies meet, pass, and rest the other way round after 3 steps
+        assert axis_period([0, 2], [0, 0], 0, gravity)[:2] == (6, 3)
+        # A body alone is at rest, and back at the start, every step
+        assert axis_period([5], [0], 0, gravity)[:2] == (1, 1)
+        # Started moving, the search goes all the way round
+        assert axis_period([1, 1], [1, -1], 0, gravity)[:2] == (6, 6)
+
+    # Started from a moving state, every backend finds the same period
+    starts = parse_start_positions(
+        """
+        <x=-1, y=0, z=2>
+        <x=2, y=-10, z=-7>
+        <x=4, y=-8, z=8>
+        <x=3, y=5, z=-1>
+    """
+    )
+    for backend in backends:
+        sim = make_simulation(starts, backend)
+        sim.stepn(5)
+        assert sim.steps_until_repeat() == 2772
+
+
+def benchmark(count=1000, steps=20):
+    """Print how fast each backend steps some number of random bodies."""
+    rng = random.Random(count)
+    starts = [[rng.randint(-1000, 1000) for _ in range(3)] for _ in range(count)]
+    for backend in available_backends():
+        if backend == "bodies" and count > 200:
+            print(f"{backend:>10}: skipped for more than 200 bodies")
+            continue
+        sim = make_simulation(starts, backend)
+        start = time.perf_counter()
+        sim.stepn(steps)
+        elapsed = time.perf_counter() - start
+        print(f"{backend:>10}: {steps / elapsed:10.1f} steps/s of {count} bodies")
+
+
+def main(backend="bodies"):
     starts = parse_start_positions(INPUT)
-    sim = Simulation(starts)
-    steps = sim.steps_until_repeat()
+    sim = make_simulation(starts, backend)
+    steps = sim.steps_until_repeat_parallel()
     print(f"simulation repeasts in {steps} steps")
 
 
 if __name__ == "__main__":
     test1()
-    # test2()
-    main()
+    test2()
+    test_backends()
+    if sys.argv[1:2] == ["--benchmark"]:
+        benchmark(*[int(value) for value in sys.argv[2:4]])
+    else:
+        main(*sys.argv[1:2])
@@ -2,13 +2,18 @@
 https://adventofcode.com/2019/day/13
 """
 
-from collections import defaultdict
-import math
-
-# Constants for Intcode computer modes
-POSITION_MODE = 0
-IMMEDIATE_MODE = 1
-RELATIVE_MODE = 2
+import io
+import os
+import struct
+import sys
+import tempfile
+import time
+
+from intcode import STATUS_HALT, STATUS_INPUT, STATUS_OUTPUT
+from intcode_binary import load_program, program_key
+from intcode_checkpoint import Checkpointer, checkpoint_key, load_checkpoint
+from intcode_jit import CompiledComputer
+from render import FrameWriter, crop, to_text
 
 # Constants for game objects
 EMPTY = 0  # No game object appears in this tile
@@ -22,198 +27,301 @@ J_LEFT = -1
 J_MIDDLE = 0
 J_RIGHT = 1
 
+# Score updates come as a tile at this position
+SCORE_POS = (-1, 0)
 
-class Halt(Exception):
-    """Signal to raise when computer exits operation normally."""
-
-    pass
+# Event logs are this, then (tick, x, y, tile) records until the end
+EVENT_MAGIC = b"ICEV"
+EVENT = struct.Struct("<Qiiq")
 
+# Characters each game object is drawn with
+ICONS = {
+    EMPTY: " ",
+    WALL: "|",
+    BLOCK: "x",
+    PADDLE: "_",
+    BALL: "o",
+}
 
-class NeedInput(Exception):
-    """Signal to raise when computer requires input."""
+# Colors each game object is drawn with in images
+COLORS = {
+    EMPTY: (0, 0, 0),
+    WALL: (128, 128, 128),
+    BLOCK: (200, 80, 40),
+    PADDLE: (240, 240, 240),
+    BALL: (60, 200, 255),
+}
 
-    pass
 
+class Computer(CompiledComputer):
+    """An Intcode computer that reports game updates in batches of outputs."""
 
-class Computer:
-    """An Intcode computer that can run a program."""
+    def step_until(self, limit):
+        """Run program until `limit` outputs are generated.
+        Returns (status, outputs) with the STATUS_* reason the run stopped,
+        popping the outputs only once there are enough of them.
+        """
+        status = self.run_until_outputs(limit)
+        if status != STATUS_OUTPUT:
+            return status, []
 
-    def __init__(self, program):
-        # program is converted from list of integers to a {index -> integer}
-        # map to support arbitrary memory assignment
-        # (e.g. writing to position 1mil without the associated 0's in memory)
-        self.program = {i: v for i, v in enumerate(program)}
-        self.inputs = []
+        # Pop the outputs for processing
+        outputs = self.outputs
         self.outputs = []
-        self.index = 0
-        self.relative_base = 0
-
-    def get_address(self, index, mode):
-        """Get the absolute index referenced by a relative index and a mode."""
-        if mode == IMMEDIATE_MODE:
-            return index
-        elif mode == POSITION_MODE:
-            return self.program[index]
-        elif mode == RELATIVE_MODE:
-            return self.program[index] + self.relative_base
-        raise Exception(f"unknown mode: {mode}")
-
-    def get_value(self, index, mode):
-        """Return a value from a program by relative index and mode."""
-        address = self.get_address(index, mode)
-        try:
-            return self.program[address]
-        except KeyError:
-            return 0
-
-    def set_value(self, index, mode, value):
-        """Set a value into the program by relative index and mode."""
-        address = self.get_address(index, mode)
-        self.program[address] = value
-
-    def process(self):
-        """Run an Intcode program. Modifiy the program in-place as needed.
-        Returns an output when it encounters Opcode 4.
-        Uses the `inputs` attribute to support Opcode 3.
-            - Each encounter of opcode 3 will remove an element from the inputs
+        return status, outputs
+
+
+class TileGrid:
+    """A map of (x, y) -> tiles kept in one bytearray of rows.
+
+    Grows to fit whatever is drawn, doubling so the first draw of the screen
+    sizes it in a few steps, and counts each tile type as they change so
+    how many of one are left is known without scanning.
+    """
+
+    def __init__(self):
+        self.cells = bytearray()
+        # Position of the first cell, and size, of the area stored
+        self.left = self.bottom = 0
+        self.width = self.height = 0
+        self.bounds = None  # (min_x, min_y, max_x, max_y) of the tiles drawn
+        self.counts = [0] * (BALL + 1)  # tiles of each type stored
+
+    def __getitem__(self, position):
+        x, y = position
+        column = x - self.left
+        row = y - self.bottom
+        if 0 <= column < self.width and 0 <= row < self.height:
+            return self.cells[row * self.width + column]
+        return EMPTY
+
+    def __setitem__(self, position, tile):
+        if not 0 <= tile < len(self.counts):
+            raise Exception(f"unknown tile {tile} at {position}")
+        x, y = position
+        column = x - self.left
+        row = y - self.bottom
+        if not (0 <= column < self.width and 0 <= row < self.height):
+            self.grow(x, y)
+            column = x - self.left
+            row = y - self.bottom
+        if self.bounds is None:
+            self.bounds = (x, y, x, y)
+        else:
+            min_x, min_y, max_x, max_y = self.bounds
+            if not (min_x <= x <= max_x and min_y <= y <= max_y):
+                self.bounds = (
+                    min(min_x, x),
+                    min(min_y, y),
+                    max(max_x, x),
+                    max(max_y, y),
+                )
+
+        index = row * self.width + column
+        self.counts[self.cells[index]] -= 1
+        self.cells[index] = tile
+        self.counts[tile] += 1
+
+    def grow(self, x, y):
+        """Store a bigger area that includes (x, y), at least doubling the
+        side it grows on.
         """
-        while True:
-            try:
-                self.step()
-            except Halt:
-                break
-        return self.outputs
-
-    def step(self):
-        """Run a single step of the intcode program."""
-        # parse opcode and parameter mode(s) from instruction
-        # (convert integer into 5-digit string with zeroes before parsing)
-        instruction = str(self.program[self.index]).zfill(5)
-        opcode = int(instruction[-2:])
-        param1_mode = int(instruction[-3])
-        param2_mode = int(instruction[-4])
-        param3_mode = int(instruction[-5])
-
-        # opcode to halt program
-        if opcode == 99:
-            raise Halt()
-
-        # opcodes for addition or multiplication
-        if opcode in (1, 2):
-            val1 = self.get_value(self.index + 1, param1_mode)
-            val2 = self.get_value(self.index + 2, param2_mode)
-
-            if opcode == 1:
-                total = val1 + val2
-            elif opcode == 2:
-                total = val1 * val2
-
-            self.set_value(self.index + 3, param3_mode, total)
-            self.index += 4
-            return
-
-        # opcode for input
-        if opcode == 3:
-            try:
-                inputval = self.inputs.pop(0)
-            except IndexError:
-                raise NeedInput()
-
-            self.set_value(self.index + 1, param1_mode, inputval)
-            self.index += 2
-            return
-
-        # opcode for output
-        if opcode == 4:
-            self.outputs += [self.get_value(self.index + 1, param1_mode)]
-            self.index += 2
-            return
-
-        # opcodes for jump-if-true / jump-if-false
-        if opcode in (5, 6):
-            val1 = self.get_value(self.index + 1, param1_mode)
-            val2 = self.get_value(self.index + 2, param2_mode)
-
-            # Should jump; update instruction pointer directly
-            if (opcode == 5 and val1 != 0) or (opcode == 6 and val1 == 0):
-                self.index = val2
-                return
-
-            # No action, continue to next instruction
-            self.index += 3
-            return
-
-        # opcode for less than / equal to
-        if opcode in (7, 8):
-            val1 = self.get_value(self.index + 1, param1_mode)
-            val2 = self.get_value(self.index + 2, param2_mode)
-
-            # Default 0 (False), set to 1 if True
-            result = 0
-            if opcode == 7 and val1 < val2:
-                result = 1
-            elif opcode == 8 and val1 == val2:
-                result = 1
-
-            self.set_value(self.index + 3, param3_mode, result)
-            self.index += 4
-            return
-
-        # opcode for relative base offset
-        if opcode == 9:
-            self.relative_base += self.get_value(self.index + 1, param1_mode)
-            self.index += 2
+        if not self.width:
+            left, bottom, width, height = x, y, 1, 1
+        else:
+            left, bottom = self.left, self.bottom
+            width, height = self.width, self.height
+            if x < left:
+                left = min(x, left - width)
+                width = self.left + self.width - left
+            elif x >= left + width:
+                width = max(x - left + 1, 2 * width)
+            if y < bottom:
+                bottom = min(y, bottom - height)
+                height = self.bottom + self.height - bottom
+            elif y >= bottom + height:
+                height = max(y - bottom + 1, 2 * height)
+
+        cells = bytearray(width * height)
+        shift = self.left - left
+        for row in range(self.height):
+            start = (row + self.bottom - bottom) * width + shift
+            old = row * self.width
+            cells[start : start + self.width] = self.cells[old : old + self.width]
+        self.counts[EMPTY] += width * height - len(self.cells)
+        self.cells = cells
+        self.left, self.bottom, self.width, self.height = left, bottom, width, height
+
+    def count(self, tile):
+        """Return how many of a tile type there are."""
+        return self.counts[tile]
+
+    def items(self):
+        """Yield ((x, y), tile) for every position within the tiles drawn."""
+        if self.bounds is None:
             return
+        min_x, min_y, max_x, max_y = self.bounds
+        for y in range(min_y, max_y + 1):
+            for x in range(min_x, max_x + 1):
+                yield (x, y), self[(x, y)]
 
-        raise Exception("unknown opcode, something went wrong")
+    def update(self, tiles):
+        """Set the tiles of a map of (x, y) -> tiles."""
+        for position, tile in tiles.items():
+            self[position] = tile
 
-    def step_until(self, limit):
-        """Run program until two outputs are generated"""
-        while len(self.outputs) != 3:
-            self.step()
+    def __iter__(self):
+        return (position for position, _ in self.items())
 
-        # Pop the outputs for processing
-        outputs = self.outputs
-        self.outputs = []
-        return outputs
+    def __len__(self):
+        if self.bounds is None:
+            return 0
+        min_x, min_y, max_x, max_y = self.bounds
+        return (max_x - min_x + 1) * (max_y - min_y + 1)
+
+    def __eq__(self, other):
+        if not isinstance(other, TileGrid):
+            return NotImplemented
+        return self.bounds == other.bounds and list(self.items()) == list(other.items())
+
+
+class EventLog:
+    """An append-only binary file of the (tick, x, y, tile) updates of games,
+    where tick is the number of joystick moves the game has chosen so far.
+    Score updates are logged as a tile at SCORE_POS.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(EVENT_MAGIC)
+
+    def write(self, tick, x, y, tile):
+        """Append one update to the log."""
+        self.file.write(EVENT.pack(tick, x, y, tile))
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_events(path):
+    """Yield every (tick, x, y, tile) update in an event log."""
+    with open(path, "rb") as file:
+        data = file.read()
+    if data[: len(EVENT_MAGIC)] != EVENT_MAGIC:
+        raise Exception(f"not a game event log: {path}")
+    # A record cut short by a crash is left out
+    end = len(data) - (len(data) - len(EVENT_MAGIC)) % EVENT.size
+    yield from EVENT.iter_unpack(memoryview(data)[len(EVENT_MAGIC) : end])
+
+
+def replay_events(path, until=None):
+    """Return (grid, score) of a game from its event log, after every update
+    or only those before tick `until`.
+    """
+    grid = TileGrid()
+    score = 0
+    for tick, x, y, tile in read_events(path):
+        if until is not None and tick >= until:
+            break
+        if (x, y) == SCORE_POS:
+            score = tile
+        else:
+            grid[(x, y)] = tile
+    return grid, score
 
 
 class Game:
     """A game played from an Intcode program."""
 
-    def __init__(self, program):
+    def __init__(self, program, checkpointer=None, renderer=None, events=None):
         self.computer = Computer(program)
-        self.grid = defaultdict(lambda: EMPTY)
+        self.grid = TileGrid()
         # Track (x, y) ball and paddle positions for "AI"
         self.ball_pos = (0, 0)
         self.paddle_pos = (0, 0)
-
-    def play_to_win(self):
-        """Return the score achieved after winning the game."""
-        score = 0
+        self.score = 0
+        self.ticks = 0  # joystick moves chosen
+        # Optional Checkpointer to save the game to as it is played
+        self.checkpointer = checkpointer
+        # Optional Renderer to draw the game with, otherwise it runs headless
+        self.renderer = renderer
+        # Optional EventLog to record every update of the game to
+        self.events = events
 
         # first two inputs are to just stay still before AI can kick in
         self.computer.inputs += [J_MIDDLE, J_MIDDLE]
 
+    @classmethod
+    def resume(cls, path, checkpointer=None, renderer=None, events=None):
+        """Return a game that continues from a checkpoint file."""
+        computer, state = load_checkpoint(path, Computer)
+        game = cls([], checkpointer, renderer, events)
+        game.computer = computer
+        game.grid.update({(x, y): tile for x, y, tile in state["grid"]})
+        game.ball_pos = tuple(state["ball_pos"])
+        game.paddle_pos = tuple(state["paddle_pos"])
+        game.score = state["score"]
+        game.ticks = state.get("ticks", 0)
+        return game
+
+    def state(self):
+        """Return the state of the game besides its computer, for checkpoints."""
+        return {
+            "grid": [[x, y, tile] for (x, y), tile in self.grid.items()],
+            "ball_pos": self.ball_pos,
+            "paddle_pos": self.paddle_pos,
+            "score": self.score,
+            "ticks": self.ticks,
+        }
+
+    def blocks_left(self):
+        """Return how many blocks are still on the screen."""
+        return self.grid.count(BLOCK)
+
+    def play_to_win(self):
+        """Return the score achieved after winning the game."""
+        renderer = self.renderer
+        if renderer is not None:
+            # Draw whatever a resumed game already has
+            for (x, y), tile in self.grid.items():
+                renderer.update(x, y, tile)
+            renderer.set_score(self.score)
+
         while True:
-            # play until computer returns 3 outputs or raises a signal
-            try:
-                x, y, tile = self.computer.step_until(3)
-            except Halt:
+            if self.checkpointer is not None:
+                # The state is only built when a save is due
+                self.checkpointer.update(self.computer, self.state)
+
+            # play until computer returns 3 outputs or stops for a signal
+            status, outputs = self.computer.step_until(3)
+            if status == STATUS_HALT:
                 break
-            except NeedInput:
+            if status == STATUS_INPUT:
                 self.set_input()
                 continue
+            x, y, tile = outputs
+            if self.events is not None:
+                self.events.write(self.ticks, x, y, tile)
 
             # update current score when game reports it
-            if (x, y) == (-1, 0):
-                score = tile
-                print(f"score is {score}")
+            if (x, y) == SCORE_POS:
+                self.score = tile
+                if renderer is not None:
+                    renderer.set_score(tile)
                 continue
 
             # Otherwise, instruction to update game grid
             self.grid[(x, y)] = tile
-            print(f"tile {tile} at {x},{y}")
+            if renderer is not None:
+                renderer.update(x, y, tile)
 
             # track and joystick positions
             if tile == BALL:
@@ -221,11 +329,13 @@ class Game:
             elif tile == PADDLE:
                 self.paddle_pos = (x, y)
 
-            # print game world whenver ball or paddle moves
-            if tile in (BALL, PADDLE):
-                print_grid(self.grid)
+            # draw game world whenever ball or paddle moves
+            if renderer is not None and tile in (BALL, PADDLE):
+                renderer.frame()
 
-        return score
+        if renderer is not None:
+            renderer.frame(force=True)
+        return self.score
 
     def set_input(self):
         """Set input value based on desired location."""
@@ -236,36 +346,120 @@ class Game:
         else:
             inp = J_MIDDLE
 
-        print(f"setting joystick input to: {inp}")
+        self.ticks += 1
         self.computer.inputs += [inp]
 
 
+class Renderer:
+    """Draws a game in a terminal with ANSI escapes as its tiles arrive.
+
+    Keeps the bounds of the grid as tiles are updated, and each frame only
+    moves the cursor to the cells that changed since the last one, redrawing
+    everything only when the bounds grow. Frames come at most `rate` times a
+    second (every frame if None), and the changes in between are merged.
+    """
+
+    def __init__(self, stream=None, rate=30, clock=time.monotonic):
+        self.stream = sys.stdout if stream is None else stream
+        self.interval = 0 if rate is None else 1 / rate
+        self.clock = clock
+        self.tiles = {}  # (x, y) -> tile of every cell drawn or to be drawn
+        self.changed = {}  # (x, y) -> tile changed since the last frame
+        self.bounds = None  # (min_x, min_y, max_x, max_y)
+        self.drawn_bounds = None  # bounds of the last frame drawn
+        self.score = None
+        self.drawn_score = None
+        self.last_frame = None
+        self.frames = 0
+
+    def update(self, x, y, tile):
+        """Note a tile to draw in the next frame."""
+        if self.tiles.get((x, y)) == tile:
+            return
+        self.tiles[(x, y)] = tile
+        self.changed[(x, y)] = tile
+        if self.bounds is None:
+            self.bounds = (x, y, x, y)
+            return
+        min_x, min_y, max_x, max_y = self.bounds
+        if not (min_x <= x <= max_x and min_y <= y <= max_y):
+            self.bounds = (min(min_x, x), min(min_y, y), max(max_x, x), max(max_y, y))
+
+    def set_score(self, score):
+        """Note a score to show in the next frame."""
+        self.score = score
+
+    def frame(self, force=False):
+        """Draw the changes since the last frame, unless one was drawn too
+        recently and the frame isn't forced. Returns whether it drew.
+        """
+        now = self.clock()
+        if not force and self.last_frame is not None:
+            if now - self.last_frame < self.interval:
+                return False
+        if self.bounds is None:
+            return False
+        self.last_frame = now
+
+        min_x, _, _, max_y = self.bounds
+        parts = []
+        if self.bounds != self.drawn_bounds:
+            parts.append(self.full_frame())
+            self.drawn_bounds = self.bounds
+            self.drawn_score = None
+        else:
+            # Rows count down from the top of the grid, as Y is flipped
+            for (x, y), tile in self.changed.items():
+                parts.append(f"\x1b[{max_y - y + 1};{x - min_x + 1}H{ICONS[tile]}")
+
+        height = max_y - self.bounds[1] + 1
+        if self.score != self.drawn_score:
+            parts.append(f"\x1b[{height + 1};1Hscore: {self.score}\x1b[K")
+            self.drawn_score = self.score
+        # Leave the cursor below the game
+        parts.append(f"\x1b[{height + 2};1H")
+
+        self.changed.clear()
+        self.stream.write("".join(parts))
+        self.stream.flush()
+        self.frames += 1
+        return True
+
+    def full_frame(self):
+        """Return escapes that clear the screen and draw every tile."""
+        min_x, min_y, max_x, max_y = self.bounds
+        tiles = self.tiles
+        rows = [
+            "".join(ICONS[tiles.get((x, y), EMPTY)] for x in range(min_x, max_x + 1))
+            for y in range(max_y, min_y - 1, -1)
+        ]
+        return "\x1b[H\x1b[2J" + "\n".join(rows)
+
+
+class FrameRecorder:
+    """Records a game as a stream of images, one each time it is drawn,
+    through the same calls as Renderer.
+    """
+
+    def __init__(self, writer):
+        self.writer = writer  # a render.FrameWriter
+        self.grid = TileGrid()
+
+    def update(self, x, y, tile):
+        self.grid[(x, y)] = tile
+
+    def set_score(self, score):
+        pass
+
+    def frame(self, force=False):
+        """Write the screen as the next frame."""
+        self.writer.write(crop(self.grid))
+        return True
+
+
 def print_grid(grid):
-    """Print a map of (x, y) -> tiles to the console."""
-    if not grid:
-        return
-
-    icons = {
-        EMPTY: " ",
-        WALL: "|",
-        BLOCK: "x",
-        PADDLE: "_",
-        BALL: "o",
-    }
-
-    # Calculate offsets for printing potentially negative range
-    min_x = min(grid, key=lambda item: item[0])[0]
-    min_y = min(grid, key=lambda item: item[1])[1]
-    max_x = max(grid, key=lambda item: item[0])[0]
-    max_y = max(grid, key=lambda item: item[1])[1]
-
-    # Loop over grid adjusting for flipped Y perspective
-    for y in range(max_y, min_y - 1, -1):
-        row = ""
-        for x in range(min_x, max_x + 1):
-            tile = grid[(x, y)]
-            row += icons[tile]
-        print(row)
+    """Print a TileGrid to the console."""
+    print(to_text(crop(grid), ICONS))
 
 
 def test():
@@ -286,18 +480,140 @@ def test():
     output = Computer(program).process()
     assert output[0] == 1125899906842624
 
+    # draw a tile, wait for the joystick, then report the score
+    program = [104, 1, 104, 2, 104, 4, 3, 20, 104, -1, 104, 0, 104, 7, 99]
+    computer = Computer(program)
+    assert computer.step_until(3) == (STATUS_OUTPUT, [1, 2, 4])
+    assert computer.step_until(3) == (STATUS_INPUT, [])
+    computer.inputs += [J_MIDDLE]
+    assert computer.step_until(3) == (STATUS_OUTPUT, [-1, 0, 7])
+    assert computer.step_until(3) == (STATUS_HALT, [])
+
+    # a game ending with a score of 10 plus the third joystick input
+    program = [104, 1, 104, 2, 104, 4, 104, 0, 104, 2, 104, 3, 3, 100]
+    program += [104, -1, 104, 0, 104, 5, 3, 100, 3, 100, 1001, 100, 10, 101]
+    program += [104, -1, 104, 0, 4, 101, 99] + [0] * 70
+    assert Game(program).play_to_win() == 11
+
+    # the same game drawn, with a frame for each ball or paddle move and the end
+    stream = io.StringIO()
+    game = Game(program, renderer=Renderer(stream, rate=None))
+    assert game.play_to_win() == 11
+    assert game.renderer.frames == 3
+    assert stream.getvalue().endswith("score: 11\x1b[K\x1b[3;1H")
+
+    # frames only draw what changed, and no more often than the rate
+    now = [0.0]
+    stream = io.StringIO()
+    renderer = Renderer(stream, rate=10, clock=lambda: now[0])
+    renderer.update(0, 0, WALL)
+    renderer.update(2, 1, BLOCK)
+    renderer.set_score(3)
+    assert renderer.frame()
+    assert stream.getvalue() == "\x1b[H\x1b[2J  x\n|  \x1b[3;1Hscore: 3\x1b[K\x1b[4;1H"
+    stream.seek(0)
+    stream.truncate()
+    renderer.update(1, 0, BALL)
+    renderer.update(2, 1, BLOCK)
+    now[0] = 0.05
+    assert not renderer.frame()
+    now[0] = 0.2
+    assert renderer.frame()
+    assert stream.getvalue() == "\x1b[2;2Ho\x1b[4;1H"
+    renderer.update(3, 1, WALL)
+    assert renderer.frame(force=True)
+    assert stream.getvalue().endswith(
+        "\x1b[H\x1b[2J  x|\n|o  \x1b[3;1Hscore: 3\x1b[K\x1b[4;1H"
+    )
+
+    # games can be recorded as a stream of frames
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "game.txt")
+        with FrameWriter(path, ICONS) as frames:
+            assert Game(program, renderer=FrameRecorder(frames)).play_to_win() == 11
+        with open(path) as file:
+            assert file.read() == "o\n_o\n_o\n"
+
+    # grids grow in every direction, and count tiles as they change
+    grid = TileGrid()
+    for x in range(5, -3, -1):
+        grid[(x, 1)] = WALL
+    grid[(0, 4)] = BLOCK
+    grid[(2, -2)] = BLOCK
+    grid[(2, -2)] = BALL
+    grid[(-2, 1)] = BLOCK
+    assert (grid.count(WALL), grid.count(BLOCK), grid.count(BALL)) == (7, 2, 1)
+    assert grid.bounds == (-2, -2, 5, 4) and len(grid) == 56
+    assert [grid[(x, 1)] for x in range(-3, 7)] == [0, 2] + [1] * 7 + [0]
+    assert (grid[(0, 4)], grid[(2, -2)], grid[(100, 100)]) == (BLOCK, BALL, EMPTY)
+
+    # a game logged to a file replays to the same screen and score
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "game.events")
+        with EventLog(path) as events:
+            game = Game(program, events=events)
+            assert game.play_to_win() == 11
+        assert game.blocks_left() == 0
+        assert list(read_events(path))[:3] == [
+            (0, 1, 2, 4),
+            (0, 0, 2, 3),
+            (0, -1, 0, 5),
+        ]
+        assert replay_events(path) == (game.grid, 11)
+        assert replay_events(path, until=1)[1] == 5
+
+    # a game resumed from a checkpoint ends the same as the whole game
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "game.ckpt")
+        game = Game(program, Checkpointer(path, interval=6))
+        assert game.play_to_win() == 11
+        assert game.checkpointer.saves == 2
+        # last saved after 12 instructions, with the third input waiting
+        resumed = Game.resume(path)
+        assert resumed.computer.instructions_run() == 12
+        assert (resumed.score, resumed.computer.inputs) == (5, [J_RIGHT])
+        assert resumed.play_to_win() == 11
+        assert resumed.grid == game.grid
+
 
 def main():
-    # Convert the text program into a list of integers (Intcode)
-    with open("data/day13.txt", "r") as file:
-        text = file.read().strip()
-    program = [int(number) for number in text.split(",")]
+    # Load the program, from its compiled copy if there is one
+    program = load_program("data/day13.txt")
 
     # Set number quarters inserted to 2 to play for free
     program[0] = 2
 
-    game = Game(program)
+    # Record every frame when given a file to stream them to, otherwise only
+    # draw the game when someone is watching, or else run headless
+    frames = None
+    if sys.argv[1:2] == ["--frames"]:
+        frames = FrameWriter(sys.argv[2], COLORS)
+        renderer = FrameRecorder(frames)
+    elif sys.stdout.isatty():
+        renderer = Renderer()
+    else:
+        renderer = None
+
+    # Carry on from the last checkpoint if a previous game of the same
+    # program didn't finish
+    key = program_key(program)
+    checkpointer = Checkpointer("data/day13.ckpt", key=key)
+    start = time.perf_counter()
+    resuming = os.path.exists(checkpointer.path)
+    if resuming and checkpoint_key(checkpointer.path) != key:
+        print(f"ignoring {checkpointer.path}, saved from another program")
+        resuming = False
+    if resuming:
+        game = Game.resume(checkpointer.path, checkpointer, renderer)
+    else:
+        game = Game(program, checkpointer, renderer)
     score = game.play_to_win()
+    if frames is not None:
+        frames.close()
+        print(f"wrote {frames.frames} frames to {frames.path}")
+    if os.path.exists(checkpointer.path):
+        os.remove(checkpointer.path)
+    print(f"played in {time.perf_counter() - start:.2f}s")
     print(f"score after breaking all blocks is: {score}")
 
 
@@ -2,8 +2,11 @@
 https://adventofcode.com/2019/day/2
 """
 
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
 
-from copy import deepcopy
+from intcode import Computer
+from intcode_binary import load_program
 
 
 def process(program):
@@ -39,18 +42,278 @@ def set_input(program, noun, verb):
     program[2] = verb
 
 
-def find_inputs(program, want_output):
+def find_inputs(program, want_output, nouns=range(0, 100), verbs=range(0, 100)):
     """Return the (noun, verb) pair that produces want_output from a program."""
-    for noun in range(0, 100):
-        for verb in range(0, 100):
-            instance = deepcopy(program)
-            set_input(instance, noun, verb)
-            process(instance)
-            if instance[0] == want_output:
-                print(f"noun {noun} and verb {verb} produce {want_output}")
+    found = search_inputs(Computer(program), want_output, nouns, verbs)
+    if found is None:
+        raise Exception(f"no noun/verb combination in range produces {want_output}")
+
+    noun, verb = found
+    print(f"noun {noun} and verb {verb} produce {want_output}")
+    return noun, verb
+
+
+def search_inputs(computer, want_output, nouns, verbs, stop=None):
+    """Return the first (noun, verb) pair that produces want_output, or None.
+    Stops early, returning None, once the optional `stop` callable is true.
+    """
+    # Every attempt forks the loaded program, copying memory only once it writes
+    for noun in nouns:
+        if stop is not None and stop():
+            return None
+        for verb in verbs:
+            instance = computer.fork()
+            set_input(instance.memory, noun, verb)
+            instance.process()
+            if instance.memory[0] == want_output:
                 return noun, verb
+    return None
+
+
+# Index of the first chunk known to match, shared with pool workers
+first_match = None
+
+
+def init_search_worker(shared_first_match):
+    """Set up a pool worker with the shared index of the first matching chunk."""
+    global first_match
+    first_match = shared_first_match
+
+
+def search_chunk(program, want_output, chunk, nouns, verbs):
+    """Search one chunk of nouns in a pool worker.
+    Gives up once an earlier chunk has already found a match.
+    """
+    found = search_inputs(
+        Computer(program),
+        want_output,
+        nouns,
+        verbs,
+        stop=lambda: first_match.value < chunk,
+    )
+    if found is not None:
+        with first_match.get_lock():
+            first_match.value = min(first_match.value, chunk)
+    return found
+
+
+def find_inputs_parallel(
+    program,
+    want_output,
+    nouns=range(0, 100),
+    verbs=range(0, 100),
+    workers=None,
+    chunk_size=4,
+):
+    """Return the same (noun, verb) pair as find_inputs using a process pool.
+
+    The nouns are split into chunks of `chunk_size` and searched by up to
+    `workers` processes (default: one per CPU). When a chunk matches, the
+    chunks after it are cancelled, but earlier chunks still finish so the
+    pair returned is the first one in the serial search order.
+    """
+    chunks = [nouns[i : i + chunk_size] for i in range(0, len(nouns), chunk_size)]
+    shared_first_match = multiprocessing.Value("q", len(chunks))
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_search_worker,
+        initargs=(shared_first_match,),
+    )
+    try:
+        futures = [
+            executor.submit(search_chunk, program, want_output, index, chunk, verbs)
+            for index, chunk in enumerate(chunks)
+        ]
+        chunk_of = {future: index for index, future in enumerate(futures)}
+        searched = set()
+        found = {}
+        for future in as_completed(futures):
+            if future.cancelled():
+                continue
+            index = chunk_of[future]
+            searched.add(index)
+            if future.result() is not None:
+                found[index] = future.result()
+                for later in futures[index + 1 :]:
+                    later.cancel()
+
+            # Done once every chunk before the earliest match has been searched
+            first = min(found, default=len(chunks))
+            if searched.issuperset(range(first)):
+                break
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+    if not found:
+        raise Exception(f"no noun/verb combination in range produces {want_output}")
+
+    noun, verb = found[min(found)]
+    print(f"noun {noun} and verb {verb} produce {want_output}")
+    return noun, verb
+
+
+def find_inputs_batch(
+    program, want_output, nouns=range(0, 100), verbs=range(0, 100), lanes=10000
+):
+    """Return the same (noun, verb) pair as find_inputs, running up to `lanes`
+    pairs at a time in lockstep. Needs NumPy, and values must fit in 64 bits.
+    """
+    # Imported here so the rest of this day runs without NumPy
+    from intcode_batch import BatchComputer
+
+    nouns_per_batch = max(1, lanes // len(verbs))
+    for start in range(0, len(nouns), nouns_per_batch):
+        chunk = nouns[start : start + nouns_per_batch]
+        batch = BatchComputer(program, len(chunk) * len(verbs))
+        batch.memory[:, 1] = [noun for noun in chunk for verb in verbs]
+        batch.memory[:, 2] = [verb for noun in chunk for verb in verbs]
+        batch.process()
+
+        matches = (batch.memory[:, 0] == want_output).nonzero()[0]
+        if len(matches):
+            noun = chunk[matches[0] // len(verbs)]
+            verb = verbs[matches[0] % len(verbs)]
+            print(f"noun {noun} and verb {verb} produce {want_output}")
+            return noun, verb
+
+    raise Exception(f"no noun/verb combination in range produces {want_output}")
+
+
+class NotSymbolic(Exception):
+    """Signal to raise when a program can't run with a symbolic noun and verb."""
+
+    pass
+
+
+class Polynomial:
+    """A polynomial of the noun and verb as {(noun power, verb power): coefficient}."""
+
+    def __init__(self, terms):
+        self.terms = {powers: coef for powers, coef in terms.items() if coef}
+
+    @classmethod
+    def of(cls, value):
+        """Return a value as a Polynomial, wrapping plain integers as constants."""
+        if isinstance(value, Polynomial):
+            return value
+        return cls({(0, 0): value})
 
-    raise Exception(f"no noun/verb combination between 0-99 produces {want_output}")
+    def __add__(self, other):
+        terms = dict(self.terms)
+        for powers, coef in Polynomial.of(other).terms.items():
+            terms[powers] = terms.get(powers, 0) + coef
+        return Polynomial(terms)
+
+    def __mul__(self, other):
+        terms = {}
+        for (n1, v1), coef1 in self.terms.items():
+            for (n2, v2), coef2 in Polynomial.of(other).terms.items():
+                powers = (n1 + n2, v1 + v2)
+                terms[powers] = terms.get(powers, 0) + coef1 * coef2
+        return Polynomial(terms)
+
+    __radd__ = __add__
+    __rmul__ = __mul__
+
+    def __repr__(self):
+        return f"<Polynomial {self.terms}>"
+
+    def first_verb(self, noun, want_output, verbs):
+        """Return the first verb where the polynomial equals want_output for a noun."""
+        # Substitute the noun to get coefficients of each power of the verb
+        coefs = {}
+        for (noun_power, verb_power), coef in self.terms.items():
+            coefs[verb_power] = coefs.get(verb_power, 0) + coef * noun**noun_power
+        coefs[0] = coefs.get(0, 0) - want_output
+        degree = max((power for power, coef in coefs.items() if coef), default=0)
+
+        if degree == 0:
+            if coefs[0] == 0 and len(verbs) > 0:
+                return verbs[0]
+            return None
+
+        # Linear in the verb: solve directly
+        if degree == 1:
+            verb, remainder = divmod(-coefs[0], coefs[1])
+            if remainder == 0 and verb in verbs:
+                return verb
+            return None
+
+        # Otherwise evaluate the polynomial without running the program
+        for verb in verbs:
+            if sum(coef * verb**power for power, coef in coefs.items()) == 0:
+                return verb
+        return None
+
+
+# Values for symbolic runs of a program
+NOUN = Polynomial({(1, 0): 1})
+VERB = Polynomial({(0, 1): 1})
+UNKNOWN = None  # read from an address that depends on the noun or verb
+
+
+def process_symbolic(program):
+    """Run a program with the noun and verb as symbols and return the final program.
+    Values are integers, Polynomials, or UNKNOWN where an address depended on them.
+    Raises NotSymbolic if control flow or a write depends on the noun or verb.
+    """
+    program = list(program)
+    set_input(program, NOUN, VERB)
+
+    def read(address):
+        if not isinstance(address, int):
+            return UNKNOWN
+        if address < 0:
+            raise NotSymbolic(f"read from negative address {address}")
+        if address >= len(program):
+            return 0
+        return program[address]
+
+    index = 0
+    while True:
+        opcode = read(index)
+        if opcode == 99:
+            return program
+        if opcode not in (1, 2) or not isinstance(opcode, int):
+            raise NotSymbolic(f"opcode at index {index} is {opcode}")
+
+        val1 = read(read(index + 1))
+        val2 = read(read(index + 2))
+        dest = read(index + 3)
+        if not isinstance(dest, int) or not 0 <= dest < len(program):
+            raise NotSymbolic(f"destination at index {index} is {dest}")
+
+        if val1 is UNKNOWN or val2 is UNKNOWN:
+            program[dest] = UNKNOWN
+        elif opcode == 1:
+            program[dest] = val1 + val2
+        else:
+            program[dest] = val1 * val2
+        index += 4
+
+
+def solve_inputs(program, want_output, nouns=range(0, 100), verbs=range(0, 100)):
+    """Return the (noun, verb) pair that produces want_output from a program.
+
+    Runs the program once with a symbolic noun and verb and solves the
+    resulting polynomial for program[0], instead of running every pair.
+    Falls back to find_inputs if the program can't be run symbolically.
+    """
+    try:
+        output = process_symbolic(program)[0]
+        if output is UNKNOWN:
+            raise NotSymbolic("output depends on an address from the noun or verb")
+    except NotSymbolic:
+        return find_inputs(program, want_output, nouns, verbs)
+
+    output = Polynomial.of(output)
+    for noun in nouns:
+        verb = output.first_verb(noun, want_output, verbs)
+        if verb is not None:
+            print(f"noun {noun} and verb {verb} produce {want_output}")
+            return noun, verb
+
+    raise Exception(f"no noun/verb combination in range produces {want_output}")
 
 
 def test():
@@ -68,15 +331,44 @@ def test():
         process(program)
         assert program == expected
 
+    # program[0] = 100 * noun + verb, padded so any noun/verb is an address
+    program = [1, 0, 0, 3, 2, 1, 13, 3, 1, 3, 2, 0, 99, 100] + [0] * 86
+    assert find_inputs(program, want_output=1202) == (12, 2)
+    assert solve_inputs(program, want_output=1202) == (12, 2)
+    assert find_inputs_batch(program, want_output=1202, lanes=500) == (12, 2)
+    big = range(0, 10**5)
+    assert solve_inputs(program, 1234567, big, big) == (11346, 99967)
+
+    # output of noun * verb, then verb * verb + noun
+    padding = [0] * 100
+    program = [1, 0, 0, 3, 2, 1, 2, 0, 99] + padding
+    assert solve_inputs(program, 12) == find_inputs(program, 12) == (1, 12)
+    assert find_inputs_parallel(program, 12, workers=2) == (1, 12)
+    # matches in chunks 1, 3, 7 and 19 of two nouns each: chunk 0 still has
+    # to be searched, and the earliest match wins over any that finish first
+    nouns = range(9, 100)
+    want = find_inputs(program, 48, nouns)
+    assert want == (12, 4)
+    for workers in (1, 2, 4):
+        assert (
+            find_inputs_parallel(program, 48, nouns, workers=workers, chunk_size=2)
+            == want
+        )
+    assert find_inputs_batch(program, 12) == (1, 12)
+    program = [1, 0, 0, 3, 2, 2, 2, 3, 1, 3, 1, 0, 99] + padding
+    assert solve_inputs(program, 50) == find_inputs(program, 50) == (1, 7)
+
+    # the noun and verb are used as addresses, which falls back to searching
+    program = [1, 0, 0, 0, 99] + padding
+    assert solve_inputs(program, 2) == (0, 0)
+
 
 def main():
-    # Convert the text program into a list of integers (Intcode)
-    with open("data/day2.txt", "r") as file:
-        text = file.read().strip()
-    program = [int(number) for number in text.split(",")]
+    # Load the program, from its compiled copy if there is one
+    program = load_program("data/day2.txt")
 
     # Find the noun / verb inputs that produce the wanted output
-    noun, verb = find_inputs(program, want_output=19690720)
+    noun, verb = solve_inputs(program, want_output=19690720)
     print(f"answer is: {100 * noun + verb}")
 
 
@@ -2,150 +2,243 @@
 https://adventofcode.com/2019/day/7
 """
 
-from copy import deepcopy
-from itertools import permutations
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, permutations
 
+from intcode import STATUS_HALT, STATUS_INPUT, Computer, NeedInput
+from intcode_binary import load_program, program_key
+from intcode_network import Network
 
-# Constants for Intcode computer modes
-POSITION_MODE = 0
-IMMEDIATE_MODE = 1
+# Most relays run side by side in one network
+RELAYS_PER_NETWORK = 2000
 
+# Most snapshots kept by the phase cache, enough for 100 programs of 10 phases
+PHASE_CACHE_ENTRIES = 1000
 
-class Amplifier:
-    """An instance of a program that can accept inputs and process many times."""
-
-    def __init__(self, program):
-        self.program = deepcopy(program)
-        self.inputs = []
-        self.halted = False
-        self.index = 0
 
-    def getvalue(self, index, mode=POSITION_MODE):
-        """Return a value from a program by index based on the mode.
-        Parameters that instructions write to should always be IMMEDIATE_MODE.
-        """
-        if mode == POSITION_MODE:
-            return self.program[self.program[index]]
-        elif mode == IMMEDIATE_MODE:
-            return self.program[index]
-        raise Exception(f"unknown mode: {mode}")
+class Amplifier(Computer):
+    """An instance of a program that can accept inputs and process many times."""
 
     def process(self):
-        """Run an Intcode program. Modifiy the program in-place as needed.
-        Returns an output when it encounters Opcode 4.
+        """Run the program until it produces an output or halts.
+        Returns the output value, or None once the program has halted.
         Uses the `inputs` attribute to support Opcode 3.
             - Each encounter of opcode 3 will remove an element from the inputs
         """
-        while self.index < len(self.program):
-            # parse opcode and parameter mode(s) from instruction
-            # (convert integer into 5-digit string with zeroes before parsing)
-            instruction = str(self.program[self.index]).zfill(5)
-            opcode = int(instruction[-2:])
-            param1_mode = int(instruction[-3])
-            param2_mode = int(instruction[-4])
-            # Since param 3 is always a destination, which is always immediate,
-            # this var is ignored at the moment but will likely be needed later
-            param3_mode = int(instruction[-5])
-
-            # opcode to halt program
-            if opcode == 99:
-                self.halted = True
-                return
-
-            # opcodes for addition or multiplication
-            if opcode in (1, 2):
-                val1 = self.getvalue(self.index + 1, param1_mode)
-                val2 = self.getvalue(self.index + 2, param2_mode)
-                dest = self.getvalue(self.index + 3, IMMEDIATE_MODE)
-
-                if opcode == 1:
-                    self.program[dest] = val1 + val2
-                elif opcode == 2:
-                    self.program[dest] = val1 * val2
-
-                self.index += 4
-                continue
+        status = self.run_until_outputs(1)
+        if status == STATUS_HALT:
+            return None
+        if status == STATUS_INPUT:
+            raise NeedInput()
+        return self.outputs.pop(0)
+
+
+class PhaseCache:
+    """Snapshots of amps taken right after their phase setting was consumed,
+    by (program hash, phase). Once it holds max_entries snapshots, the least
+    recently used one is dropped for each new one.
+    """
+
+    def __init__(self, max_entries=PHASE_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.snapshots = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def start(self, amp, key, phase):
+        """Return a fork of an amp, whose program hashes to key, that has
+        consumed a phase setting and is waiting for its next input.
+        """
+        snapshot = self.snapshots.get((key, phase))
+        if snapshot is None:
+            self.misses += 1
+            started = amp.fork()
+            started.inputs += [phase]
+            started.run_until_blocked()
+            snapshot = self.snapshots[(key, phase)] = started.snapshot()
+            if len(self.snapshots) > self.max_entries:
+                self.snapshots.popitem(last=False)
+        else:
+            self.hits += 1
+            self.snapshots.move_to_end((key, phase))
+        return type(amp).from_snapshot(snapshot)
+
+    def clear(self):
+        """Forget every snapshot and reset the counters."""
+        self.__init__(self.max_entries)
+
+
+# Shared by every search, so amps only run through a recent phase once
+PHASE_CACHE = PhaseCache()
+
+
+def best_phase_settings(program, phases=range(5, 10), shared_prefix=False):
+    """Return the best phase settings for a relay of a program, with one amp
+    per phase. With shared_prefix, permutations that begin with the same
+    phases share the amps' first pass through the relay.
+    """
+    calcs = relay_signals(program, phases, shared_prefix=shared_prefix)
+    return max(calcs, key=calcs.get)
 
-            # opcode for input
-            if opcode == 3:
-                dest = self.getvalue(self.index + 1, IMMEDIATE_MODE)
-                self.program[dest] = self.inputs.pop(0)
 
-                self.index += 2
-                continue
+def best_phase_settings_parallel(
+    program, phases=range(5, 10), shared_prefix=False, workers=None
+):
+    """Return the same best phase settings as best_phase_settings using a
+    process pool, with one job per first phase.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(relay_signals, program, phases, (first,), shared_prefix)
+            for first in phases
+        ]
+        # Merged in serial order, so ties go to the same settings
+        calcs = {}
+        for future in futures:
+            calcs.update(future.result())
+    return max(calcs, key=calcs.get)
 
-            # opcode for output
-            if opcode == 4:
-                value = self.getvalue(self.index + 1, param1_mode)
-                self.index += 2
-                return value
 
-            # opcodes for jump-if-true / jump-if-false
-            if opcode in (5, 6):
-                val1 = self.getvalue(self.index + 1, param1_mode)
-                val2 = self.getvalue(self.index + 2, param2_mode)
+def relay_signals(program, phases, prefix=(), shared_prefix=False):
+    """Return {phase settings: signal} for every permutation of phases that
+    starts with a prefix, in the order of `permutations`.
+    """
+    amp = Amplifier(program)
+    key = program_key(program)
+    if shared_prefix:
+        started = start_relays_sharing_prefixes(amp, phases, prefix, key)
+    else:
+        rest = [phase for phase in phases if phase not in prefix]
+        started = (
+            (prefix + tail, start_relay(amp, prefix + tail, key), 0)
+            for tail in permutations(rest)
+        )
+
+    # Relays run side by side in networks of a limited size
+    calcs = {}
+    while True:
+        network = Network()
+        relays = {
+            settings: add_relay(network, amps, signal)
+            for settings, amps, signal in islice(started, RELAYS_PER_NETWORK)
+        }
+        if not relays:
+            return calcs
+        network.run()
+        for settings, relay in relays.items():
+            calcs[settings] = relay[-1].last_output
+
+
+def best_phase_settings_batch(program, phases=range(5, 10)):
+    """Return the same best phase settings as best_phase_settings, running
+    every permutation at once in lockstep. Needs NumPy.
+    """
+    # Imported here so the rest of this day runs without NumPy
+    from intcode_batch import BatchComputer
+
+    # One batch per amp in the relay, with one lane per permutation
+    settings = list(permutations(phases))
+    relay = [BatchComputer(program, len(settings)) for _ in phases]
+    for position, amps in enumerate(relay):
+        for lane, phase_settings in enumerate(settings):
+            amps.inputs[lane].append(phase_settings[position])
+    for inputs in relay[0].inputs:
+        inputs.append(0)
+
+    # Pass each batch's outputs on to the next until every lane has halted
+    signals = [0] * len(settings)
+    while not all(amps.halted.all() for amps in relay):
+        passed = 0
+        for position, amps in enumerate(relay):
+            amps.process()
+            following = relay[(position + 1) % len(relay)]
+            for lane, outputs in enumerate(amps.outputs):
+                if outputs and amps is relay[-1]:
+                    signals[lane] = outputs[-1]
+                following.inputs[lane] += outputs
+                passed += len(outputs)
+                outputs.clear()
+        if not passed:
+            raise Exception("amp relay is waiting on input that never comes")
+
+    best = max(range(len(settings)), key=signals.__getitem__)
+    return settings[best]
 
-                # Should jump; update instruction pointer directly
-                if (opcode == 5 and val1 != 0) or (opcode == 6 and val1 == 0):
-                    self.index = val2
-                    continue
 
-                # No action, continue to next instruction
-                self.index += 3
-                continue
+def thruster_signal(program, phase_settings):
+    """Return total signal produced from a program run through an amp relay."""
+    return relay_signal(Amplifier(program), phase_settings, program_key(program))
 
-            # opcode for less than / equal to
-            if opcode in (7, 8):
-                val1 = self.getvalue(self.index + 1, param1_mode)
-                val2 = self.getvalue(self.index + 2, param2_mode)
-                dest = self.getvalue(self.index + 3, IMMEDIATE_MODE)
 
-                # Default 0 (False), set to 1 if True
-                self.program[dest] = 0
-                if opcode == 7 and val1 < val2:
-                    self.program[dest] = 1
-                elif opcode == 8 and val1 == val2:
-                    self.program[dest] = 1
+def relay_signal(amp, phase_settings, key=None):
+    """Return total signal produced from forks of an amp run as a relay."""
+    network = Network()
+    relay = add_relay(network, start_relay(amp, phase_settings, key), 0)
+    network.run()
+    return relay[-1].last_output
 
-                self.index += 4
-                continue
 
-            raise Exception("unknown opcode, something went wrong")
+def start_relay(amp, phase_settings, key=None):
+    """Return forks of an amp for a relay, given their phase settings.
+    With the program's key, they come from PHASE_CACHE already past them.
+    """
+    return [phased_amp(amp, init_value, key) for init_value in phase_settings]
 
 
-def best_phase_settings(program):
-    """Return the best phase settings for a 5-amp relay of a program."""
-    calcs = {
-        settings: thruster_signal(program, settings)
-        for settings in permutations(range(5, 10))
-    }
-    return max(calcs, key=calcs.get)
+def phased_amp(amp, phase, key=None):
+    """Return a fork of an amp given a phase setting as first input.
+    With the program's key, it comes from PHASE_CACHE already past it.
+    """
+    if key is not None:
+        return PHASE_CACHE.start(amp, key, phase)
+    relay_amp = amp.fork()
+    relay_amp.inputs += [phase]
+    return relay_amp
 
 
-def thruster_signal(program, phase_settings):
-    """Return total signal produced from a program run through an amp relay."""
-    # Create a relay of 5 Amplifiers with their phase settings as first input
-    relay = []
-    for init_value in phase_settings:
-        amp = Amplifier(program)
-        amp.inputs += [init_value]
-        relay += [amp]
-
-    # Run the relay until all amps have halted
-    value = 0
-    while True:
-        if all(amp.halted for amp in relay):
-            break
-        for amp in relay:
-            # Pass over any amps that have halted
-            if amp.halted:
+def start_relays_sharing_prefixes(amp, phases, prefix=(), key=None):
+    """Yield (phase settings, amps, signal) for every permutation of phases that
+    starts with a prefix, with each amp run up to its first output.
+
+    The first pass of a relay only depends on the phases up to each amp, so
+    each amp is run once per distinct prefix and forked for every relay that
+    starts with it, rather than once per relay.
+    """
+
+    def visit(settings, started, signal):
+        depth = len(settings)
+        if depth == len(phases):
+            yield settings, [relay_amp.fork() for relay_amp in started], signal
+            return
+
+        choices = prefix[depth : depth + 1] or phases
+        for phase in choices:
+            if phase in settings:
                 continue
-            amp.inputs += [value]
-            newvalue = amp.process()
-            if newvalue is not None:
-                value = newvalue
+            relay_amp = phased_amp(amp, phase, key)
+            relay_amp.inputs += [signal]
+            output = relay_amp.process()
+            if output is None:
+                raise Exception(f"amp halted before any output: {settings + (phase,)}")
+            yield from visit(settings + (phase,), started + [relay_amp], output)
+
+    return visit((), [], 0)
 
-    return value
+
+def add_relay(network, amps, signal):
+    """Add amps to a network as a relay given a signal, returning their machines.
+    The relay's signal is the last output of the last machine once it has run.
+    """
+    # Each amp sends its outputs on to the next in a loop
+    relay = [network.add(relay_amp) for relay_amp in amps]
+    for relay_amp, following in zip(relay, relay[1:] + relay[:1]):
+        network.connect(relay_amp, following)
+
+    # The signal going into the first amp came out of the last one
+    relay[0].computer.inputs += [signal]
+    relay[-1].last_output = signal
+    return relay
 
 
 def test():
@@ -180,11 +273,27 @@ def test():
         0,
         5,
     ]
+    PHASE_CACHE.clear()
     best = best_phase_settings(program)
+    # each phase ran once, and the other 595 amps started from snapshots
+    assert (PHASE_CACHE.misses, PHASE_CACHE.hits) == (5, 595)
     max_signal = thruster_signal(program, best)
-    assert best == (9, 8, 7, 6, 5)
+    assert PHASE_CACHE.misses == 5
+    assert relay_signal(Amplifier(program), best) == max_signal
+    assert best == best_phase_settings_batch(program) == (9, 8, 7, 6, 5)
+    assert best_phase_settings(program, shared_prefix=True) == best
+    assert best_phase_settings_parallel(program, workers=2) == best
+    assert best_phase_settings_parallel(program, range(5, 9), True) == (8, 7, 6, 5)
     assert max_signal == 139629729
 
+    # a small cache keeps the most recently used snapshots
+    cache = PhaseCache(max_entries=2)
+    amp = Amplifier(program)
+    for phase in (5, 6, 5, 7, 5, 6):
+        cache.start(amp, "key", phase)
+    assert (cache.misses, cache.hits) == (4, 2)
+    assert list(cache.snapshots) == [("key", 5), ("key", 6)]
+
     program = [
         3,
         52,
@@ -246,15 +355,13 @@ def test():
     ]
     best = best_phase_settings(program)
     max_signal = thruster_signal(program, best)
-    assert best == (9, 7, 8, 5, 6)
+    assert best == best_phase_settings_batch(program) == (9, 7, 8, 5, 6)
     assert max_signal == 18216
 
 
 def main():
-    # Convert the text program into a list of integers (Intcode)
-    with open("data/day7.txt", "r") as file:
-        text = file.read().strip()
-    program = [int(number) for number in text.split(",")]
+    # Load the program, from its compiled copy if there is one
+    program = load_program("data/day7.txt")
 
     # Possible sequences are [0,1,2,3,4] in any order
     best = best_phase_settings(program)
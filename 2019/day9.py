@@ -2,132 +2,9 @@
 https://adventofcode.com/2019/day/9
 """
 
-# Constants for Intcode computer modes
-POSITION_MODE = 0
-IMMEDIATE_MODE = 1
-RELATIVE_MODE = 2
-
-
-class Computer:
-    """An Intcode computer that can run a program."""
-
-    def __init__(self, program):
-        # program is converted from list of integers to a {index -> integer}
-        # map to support arbitrary memory assignment
-        # (e.g. writing to position 1mil without the associated 0's in memory)
-        self.program = {i: v for i, v in enumerate(program)}
-        self.inputs = []
-        self.index = 0
-        self.relative_base = 0
-
-    def get_address(self, index, mode):
-        """Get the absolute index referenced by a relative index and a mode."""
-        if mode == IMMEDIATE_MODE:
-            return index
-        elif mode == POSITION_MODE:
-            return self.program[index]
-        elif mode == RELATIVE_MODE:
-            return self.program[index] + self.relative_base
-        raise Exception(f"unknown mode: {mode}")
-
-    def get_value(self, index, mode):
-        """Return a value from a program by relative index and mode."""
-        address = self.get_address(index, mode)
-        try:
-            return self.program[address]
-        except KeyError:
-            return 0
-
-    def set_value(self, index, mode, value):
-        """Set a value into the program by relative index and mode."""
-        address = self.get_address(index, mode)
-        self.program[address] = value
-
-    def process(self):
-        """Run an Intcode program. Modifiy the program in-place as needed.
-        Returns an output when it encounters Opcode 4.
-        Uses the `inputs` attribute to support Opcode 3.
-            - Each encounter of opcode 3 will remove an element from the inputs
-        """
-        outputs = []
-
-        # Prevent infinite loop programs / bugs while developing
-        while True:
-            # parse opcode and parameter mode(s) from instruction
-            # (convert integer into 5-digit string with zeroes before parsing)
-            instruction = str(self.program[self.index]).zfill(5)
-            opcode = int(instruction[-2:])
-            param1_mode = int(instruction[-3])
-            param2_mode = int(instruction[-4])
-            param3_mode = int(instruction[-5])
-
-            # opcode to halt program
-            if opcode == 99:
-                return outputs
-
-            # opcodes for addition or multiplication
-            if opcode in (1, 2):
-                val1 = self.get_value(self.index + 1, param1_mode)
-                val2 = self.get_value(self.index + 2, param2_mode)
-
-                if opcode == 1:
-                    total = val1 + val2
-                elif opcode == 2:
-                    total = val1 * val2
-
-                self.set_value(self.index + 3, param3_mode, total)
-                self.index += 4
-                continue
-
-            # opcode for input
-            if opcode == 3:
-                self.set_value(self.index + 1, param1_mode, self.inputs.pop(0))
-                self.index += 2
-                continue
-
-            # opcode for output
-            if opcode == 4:
-                outputs += [self.get_value(self.index + 1, param1_mode)]
-                self.index += 2
-                continue
-
-            # opcodes for jump-if-true / jump-if-false
-            if opcode in (5, 6):
-                val1 = self.get_value(self.index + 1, param1_mode)
-                val2 = self.get_value(self.index + 2, param2_mode)
-
-                # Should jump; update instruction pointer directly
-                if (opcode == 5 and val1 != 0) or (opcode == 6 and val1 == 0):
-                    self.index = val2
-                    continue
-
-                # No action, continue to next instruction
-                self.index += 3
-                continue
-
-            # opcode for less than / equal to
-            if opcode in (7, 8):
-                val1 = self.get_value(self.index + 1, param1_mode)
-                val2 = self.get_value(self.index + 2, param2_mode)
-
-                # Default 0 (False), set to 1 if True
-                result = 0
-                if opcode == 7 and val1 < val2:
-                    result = 1
-                elif opcode == 8 and val1 == val2:
-                    result = 1
-
-                self.set_value(self.index + 3, param3_mode, result)
-                self.index += 4
-                continue
-
-            # opcode for relative base offset
-            if opcode == 9:
-                self.relative_base += self.get_value(self.index + 1, param1_mode)
-                self.index += 2
-                continue
-
-            raise Exception("unknown opcode, something went wrong")
+from intcode import Computer
+from intcode_binary import load_memory
+from intcode_jit import CompiledComputer
 
 
 def test():
@@ -150,12 +27,10 @@ def test():
 
 
 def main():
-    # Convert the text program into a list of integers (Intcode)
-    with open("data/day9.txt", "r") as file:
-        text = file.read().strip()
-    program = [int(number) for number in text.split(",")]
+    # Load the program, from its compiled copy if there is one
+    program = load_memory("data/day9.txt")
 
-    computer = Computer(program)
+    computer = CompiledComputer(program)
     computer.inputs += [2]
     output = computer.process()
 
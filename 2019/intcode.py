@@ -0,0 +1,764 @@
+"""
+Intcode computer shared by the 2019 puzzles.
+
+https://adventofcode.com/2019/day/2
+https://adventofcode.com/2019/day/5
+https://adventofcode.com/2019/day/9
+"""
+
+# Constants for Intcode computer modes
+POSITION_MODE = 0
+IMMEDIATE_MODE = 1
+RELATIVE_MODE = 2
+
+# Constants for the reason a run stopped
+STATUS_OUTPUT = 1  # the wanted number of outputs were produced
+STATUS_INPUT = 2  # opcode 3 found no input waiting
+STATUS_HALT = 3  # opcode 99 stopped the program
+
+# Memory is a flat list grown a page at a time, up to FAR_ADDRESS; cells past
+# that are kept in a map, so writing far past the end of a program (e.g.
+# position 1mil) only costs the one cell that is touched
+PAGE_SIZE = 1 << 10
+PAGE_MASK = PAGE_SIZE - 1
+FAR_ADDRESS = 1 << 16
+
+
+class Halt(Exception):
+    """Signal to raise when computer exits operation normally."""
+
+    pass
+
+
+class NeedInput(Exception):
+    """Signal to raise when computer requires input."""
+
+    pass
+
+
+def decode(instruction):
+    """Split an instruction into (opcode, param1_mode, param2_mode, param3_mode)."""
+    return (
+        instruction % 100,
+        instruction // 100 % 10,
+        instruction // 1000 % 10,
+        instruction // 10000 % 10,
+    )
+
+
+class Memory:
+    """Intcode memory stored as one flat list of integers, so a cell is read
+    with a single subscript.
+
+    Reads of memory that was never written return 0 without allocating.
+    Forks share the list, and whichever writes to it first copies it.
+    """
+
+    def __init__(self, program=()):
+        self.cells = list(program)
+        self.cells += [0] * (-len(self.cells) % PAGE_SIZE)
+        # Whether only this memory uses the list and may write in place
+        self.owned = True
+        # {address -> value} for cells written at or past FAR_ADDRESS
+        self.far = {}
+
+    def read(self, address):
+        """Return the value stored at an address."""
+        if address < 0:
+            raise Exception(f"negative address: {address}")
+        try:
+            return self.cells[address]
+        except IndexError:
+            return self.far.get(address, 0)
+
+    def write(self, address, value):
+        """Store a value at an address, growing or copying the list if needed."""
+        if address < 0:
+            raise Exception(f"negative address: {address}")
+        if address >= FAR_ADDRESS:
+            self.far[address] = value
+            return
+        if not self.owned:
+            self.cells = list(self.cells)
+            self.owned = True
+        cells = self.cells
+        if address >= len(cells):
+            # Grow to the end of the page the address is on
+            cells += [0] * ((address | PAGE_MASK) + 1 - len(cells))
+        cells[address] = value
+
+    def fork(self):
+        """Return a copy of this memory that shares its list until either writes."""
+        clone = Memory()
+        clone.cells = self.cells
+        clone.owned = self.owned = False
+        # Far cells are rare enough to just copy
+        clone.far = dict(self.far)
+        return clone
+
+    __getitem__ = read
+    __setitem__ = write
+
+
+class Snapshot:
+    """Saved state of a Computer, which can be restored any number of times."""
+
+    def __init__(self, computer):
+        self.memory = computer.memory.fork()
+        self.index = computer.index
+        self.relative_base = computer.relative_base
+        self.inputs = tuple(computer.inputs)
+        self.outputs = tuple(computer.outputs)
+        self.halted = computer.halted
+
+
+class Loop:
+    """A loop of adds, multiplies and comparisons, with no other jumps and no
+    input or output, closed by a conditional jump back to its start.
+
+    Found at a backward jump, and kept as the raw cells it was decoded from
+    so a changed loop is decoded again. When every cell the loop writes is
+    either a counter, only ever incremented by a value the loop doesn't
+    change, or set each pass from counters before being read, the pass it
+    exits on is solved in closed form and the loop is skipped straight to
+    its end state.
+    """
+
+    def __init__(self, start, jump, cells, body, test):
+        self.start = start
+        self.jump = jump
+        self.cells = cells
+        # [(opcode, ((mode, param), (mode, param), (mode, param)))]
+        self.body = body
+        self.test = test  # (opcode, mode, param) of the closing jump
+        self.length = len(body) + 1
+
+    @classmethod
+    def find(cls, memory, start, jump):
+        """Return the Loop from start to a jump back to it, or None if the
+        instructions can't be skipped.
+        """
+        body = []
+        index = start
+        while index < jump:
+            opcode, *modes = decode(memory.read(index))
+            if opcode not in (1, 2, 7, 8) or index + 4 > jump:
+                return None
+            # Immediate writes store into the loop's own code
+            if any(mode not in (0, 1, 2) for mode in modes) or modes[2] == 1:
+                return None
+            params = [memory.read(index + offset) for offset in (1, 2, 3)]
+            body.append((opcode, tuple(zip(modes, params))))
+            index += 4
+
+        opcode, mode1, mode2, _ = decode(memory.read(jump))
+        if opcode not in (5, 6) or mode1 not in (0, 2) or mode2 != IMMEDIATE_MODE:
+            return None
+        if memory.read(jump + 2) != start:
+            return None
+        cells = tuple(memory.read(address) for address in range(start, jump + 3))
+        return cls(start, jump, cells, body, (opcode, mode1, memory.read(jump + 1)))
+
+    def matches(self, memory):
+        """Return whether the loop's code is still as it was decoded."""
+        start = self.start
+        return all(
+            memory.read(start + offset) == cell
+            for offset, cell in enumerate(self.cells)
+        )
+
+    def skip(self, computer):
+        """Bring a computer at the loop's start to the state after the loop
+        exits, as if every pass had run. Returns the instructions skipped,
+        or 0 if the loop couldn't be solved and the computer wasn't changed.
+        """
+        rb = computer.relative_base
+        read = computer.memory.read
+
+        def resolve(mode, param):
+            # Returns (None, value) for an immediate, or (address, None)
+            if mode == IMMEDIATE_MODE:
+                return None, param
+            return (param + rb if mode == RELATIVE_MODE else param), None
+
+        steps = []
+        for opcode, params in self.body:
+            left, right, (dest, _) = [resolve(mode, param) for mode, param in params]
+            steps.append((opcode, left, right, dest))
+        test_opcode, test_mode, test_param = self.test
+        condition, _ = resolve(test_mode, test_param)
+
+        written = {dest for _, _, _, dest in steps}
+        addresses = written | {condition}
+        addresses.update(operand[0] for step in steps for operand in step[1:3])
+        addresses.discard(None)
+        if min(addresses) < 0 or any(
+            self.start <= address < self.jump + 3 for address in written
+        ):
+            return 0
+
+        # Counters only ever add something unchanged by the loop to themselves
+        increments = {}
+        for opcode, left, right, dest in steps:
+            if dest in (left[0], right[0]):
+                other = right if left[0] == dest else left
+                if opcode != 1 or other[0] in written:
+                    return 0
+                increments[dest] = 0
+        if any(
+            dest in increments and dest not in (left[0], right[0])
+            for _, left, right, dest in steps
+        ):
+            return 0
+
+        # Values within a pass are (base, slope): base + slope * pass, or
+        # comparisons of (operator, base, slope) against 0
+        start_values = {address: read(address) for address in increments}
+        for opcode, left, right, dest in steps:
+            if dest in increments:
+                other = right if left[0] == dest else left
+                increments[dest] += other[1] if other[0] is None else read(other[0])
+        added = dict.fromkeys(increments, 0)
+        values = {}
+
+        def value(operand):
+            address, immediate = operand
+            if address is None:
+                return immediate, 0
+            if address in increments:
+                return start_values[address] + added[address], increments[address]
+            if address in written:
+                # Set earlier in this pass, or carried over from the last one
+                if address not in values or len(values[address]) != 2:
+                    return None
+                return values[address]
+            return read(address), 0
+
+        for opcode, left, right, dest in steps:
+            if dest in increments:
+                other = right if left[0] == dest else left
+                added[dest] += value(other)[0]
+                continue
+            left, right = value(left), value(right)
+            if left is None or right is None:
+                return 0
+            if opcode == 1:
+                values[dest] = (left[0] + right[0], left[1] + right[1])
+            elif opcode == 2:
+                if left[1] and right[1]:
+                    return 0
+                values[dest] = (
+                    left[0] * right[0],
+                    left[0] * right[1] + left[1] * right[0],
+                )
+            else:
+                operator = "<" if opcode == 7 else "=="
+                values[dest] = (operator, left[0] - right[0], left[1] - right[1])
+
+        # The loop exits on the first pass its jump isn't taken
+        if condition in increments or condition not in values:
+            base, slope = value((condition, None))
+            last = first_pass("==", base, slope, test_opcode == 5)
+        elif len(values[condition]) == 2:
+            base, slope = values[condition]
+            last = first_pass("==", base, slope, test_opcode == 5)
+        else:
+            last = first_pass(*values[condition], test_opcode == 6)
+        # A loop that never exits or exits on its first pass is left to run
+        if not last:
+            return 0
+
+        passes = last + 1
+        for address, increment in increments.items():
+            computer.store(address, start_values[address] + passes * increment)
+        for address, result in values.items():
+            if len(result) == 2:
+                base, slope = result
+                computer.store(address, base + slope * last)
+            else:
+                operator, base, slope = result
+                difference = base + slope * last
+                computer.store(
+                    address, int(difference < 0 if operator == "<" else difference == 0)
+                )
+        computer.index = self.jump + 3
+        return passes * self.length
+
+
+def first_pass(operator, base, slope, wanted):
+    """Return the first pass >= 0 where (base + slope * pass) compared to 0 by
+    "<" or "==" gives `wanted`, or None if there is none.
+    """
+    if operator == "==":
+        if not wanted:
+            if base != 0:
+                return 0
+            return 1 if slope else None
+        if not slope:
+            return 0 if base == 0 else None
+        passes, remainder = divmod(-base, slope)
+        return passes if remainder == 0 and passes >= 0 else None
+
+    if wanted:
+        if base < 0:
+            return 0
+        return base // -slope + 1 if slope < 0 else None
+    if base >= 0:
+        return 0
+    return -(base // slope) if slope > 0 else None
+
+
+class Computer:
+    """An Intcode computer that can run a program."""
+
+    def __init__(self, program):
+        # A program can also come already loaded into Memory
+        self.memory = program if isinstance(program, Memory) else Memory(program)
+        self.inputs = []
+        self.outputs = []
+        self.index = 0
+        self.halted = False
+        self.relative_base = 0
+        # {index -> (handler, mode1, mode2, mode3)} for instructions already
+        # decoded, dropped whenever set_value writes over that index
+        self.decoded = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Whether loops that can be solved are skipped instead of run
+        self.fast_forward = True
+        # {loop start -> Loop, or False if it can't be skipped}
+        self.loops = {}
+        self.skipped_instructions = 0
+        # Instructions run before this computer was resumed from a checkpoint
+        self.resumed_instructions = 0
+
+    def get_address(self, index, mode):
+        """Get the absolute index referenced by a relative index and a mode."""
+        if mode == IMMEDIATE_MODE:
+            return index
+        # Parameters follow the instruction pointer, which is never negative
+        # (see `get_jump_target`), so the list of cells can be indexed directly
+        try:
+            pointer = self.memory.cells[index]
+        except IndexError:
+            pointer = self.memory.read(index)
+        if mode == POSITION_MODE:
+            return pointer
+        elif mode == RELATIVE_MODE:
+            return pointer + self.relative_base
+        raise Exception(f"unknown mode: {mode}")
+
+    def get_value(self, index, mode):
+        """Return a value from a program by relative index and mode."""
+        # Same as reading memory at get_address, but inlined as this is
+        # called for nearly every parameter of every instruction
+        cells = self.memory.cells
+        try:
+            address = cells[index]
+            if mode == IMMEDIATE_MODE:
+                return address
+            if mode == RELATIVE_MODE:
+                address += self.relative_base
+            elif mode != POSITION_MODE:
+                raise Exception(f"unknown mode: {mode}")
+            if address >= 0:
+                return cells[address]
+        except IndexError:
+            pass
+        return self.memory.read(self.get_address(index, mode))
+
+    def set_value(self, index, mode, value):
+        """Set a value into the program by relative index and mode."""
+        # Same as writing memory at get_address, inlined like get_value
+        memory = self.memory
+        cells = memory.cells
+        try:
+            address = cells[index]
+            if mode == RELATIVE_MODE:
+                address += self.relative_base
+            elif mode != POSITION_MODE:
+                address = self.get_address(index, mode)
+            if address >= 0 and memory.owned:
+                cells[address] = value
+                if address in self.decoded:
+                    del self.decoded[address]
+                return
+        except IndexError:
+            pass
+        address = self.get_address(index, mode)
+        self.memory.write(address, value)
+        self.decoded.pop(address, None)
+
+    def store(self, address, value):
+        """Write a value straight to an address, dropping anything cached
+        about the code there.
+        """
+        self.memory.write(address, value)
+        self.invalidate(address)
+
+    def invalidate(self, address):
+        """Drop the decoded instruction at an address."""
+        self.decoded.pop(address, None)
+
+    def snapshot(self):
+        """Return the current state, sharing memory until it is written."""
+        return Snapshot(self)
+
+    def restore(self, snapshot):
+        """Return to the state saved in a snapshot."""
+        self.memory = snapshot.memory.fork()
+        self.index = snapshot.index
+        self.relative_base = snapshot.relative_base
+        self.inputs = list(snapshot.inputs)
+        self.outputs = list(snapshot.outputs)
+        self.halted = snapshot.halted
+        self.decoded = {}
+        self.loops = {}
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """Return a new computer that continues from the state in a snapshot."""
+        computer = cls([])
+        computer.restore(snapshot)
+        return computer
+
+    def fork(self):
+        """Return a new computer of the same type that continues from this state."""
+        return type(self).from_snapshot(self.snapshot())
+
+    def process(self):
+        """Run an Intcode program until it halts.
+        Returns all outputs produced by Opcode 4.
+        Uses the `inputs` attribute to support Opcode 3.
+            - Each encounter of opcode 3 will remove an element from the inputs
+        """
+        try:
+            self.run(float("inf"))
+        except Halt:
+            pass
+        return self.outputs
+
+    def run_until_outputs(self, count):
+        """Run until `outputs` holds at least `count` values, opcode 3 has no
+        input or the program halts. Returns the STATUS_* reason it stopped.
+        """
+        try:
+            self.run(count)
+        except Halt:
+            return STATUS_HALT
+        except NeedInput:
+            return STATUS_INPUT
+        return STATUS_OUTPUT
+
+    def run_until_blocked(self):
+        """Run until opcode 3 has no input or the program halts.
+        Returns STATUS_INPUT or STATUS_HALT.
+        """
+        return self.run_until_outputs(float("inf"))
+
+    def run(self, count):
+        """Step until `outputs` holds at least `count` values.
+        Raises Halt and NeedInput the same as step.
+        """
+        outputs = self.outputs
+        # Anything replacing step (a subclass or an attached profiler) has
+        # to see every instruction, so only plain computers skip calling it
+        if self.step.__func__ is not Computer.step:
+            while len(outputs) < count:
+                self.step()
+            return
+
+        # Same as calling step, but with the lookups kept in locals, and the
+        # outputs only counted after an instruction that adds to them
+        if len(outputs) >= count:
+            return
+        decoded = self.decoded
+        write_output = Computer.write_output
+        hits = 0
+        try:
+            while True:
+                try:
+                    handler, mode1, mode2, mode3 = decoded[self.index]
+                    hits += 1
+                except KeyError:
+                    handler, mode1, mode2, mode3 = self.decode(self.index)
+                handler(self, mode1, mode2, mode3)
+                if handler is write_output and len(outputs) >= count:
+                    return
+        finally:
+            self.cache_hits += hits
+
+    def step(self):
+        """Run a single step of the intcode program.
+        Raises Halt on opcode 99 and NeedInput when opcode 3 has no input.
+        """
+        try:
+            handler, mode1, mode2, mode3 = self.decoded[self.index]
+            self.cache_hits += 1
+        except KeyError:
+            handler, mode1, mode2, mode3 = self.decode(self.index)
+        handler(self, mode1, mode2, mode3)
+
+    def decode(self, index):
+        """Decode the instruction at an index and cache it for later steps.
+        Returns (handler, mode1, mode2, mode3).
+        """
+        opcode, mode1, mode2, mode3 = decode(self.memory.read(index))
+        try:
+            handler = HANDLERS[opcode]
+        except KeyError:
+            raise Exception(f"unknown opcode {opcode} at index {index}")
+        self.cache_misses += 1
+        self.decoded[index] = (handler, mode1, mode2, mode3)
+        return self.decoded[index]
+
+    def instructions_run(self):
+        """Return how many instructions this computer has run, counting
+        those of skipped loops.
+        """
+        # Every step either reuses a decoded instruction or decodes one
+        ran = self.cache_hits + self.cache_misses + self.skipped_instructions
+        return ran + self.resumed_instructions
+
+    def cache_hit_rate(self):
+        """Return the fraction of steps that reused a decoded instruction."""
+        total = self.cache_hits + self.cache_misses
+        if not total:
+            return 0.0
+        return self.cache_hits / total
+
+    def add(self, mode1, mode2, mode3):
+        """Opcode 1: store the sum of two parameters."""
+        val1 = self.get_value(self.index + 1, mode1)
+        val2 = self.get_value(self.index + 2, mode2)
+        self.set_value(self.index + 3, mode3, val1 + val2)
+        self.index += 4
+
+    def multiply(self, mode1, mode2, mode3):
+        """Opcode 2: store the product of two parameters."""
+        val1 = self.get_value(self.index + 1, mode1)
+        val2 = self.get_value(self.index + 2, mode2)
+        self.set_value(self.index + 3, mode3, val1 * val2)
+        self.index += 4
+
+    def read_input(self, mode1, mode2, mode3):
+        """Opcode 3: store the next value from `inputs`."""
+        if not self.inputs:
+            raise NeedInput()
+        self.set_value(self.index + 1, mode1, self.inputs.pop(0))
+        self.index += 2
+
+    def write_output(self, mode1, mode2, mode3):
+        """Opcode 4: append a parameter to `outputs`."""
+        self.outputs.append(self.get_value(self.index + 1, mode1))
+        self.index += 2
+
+    def jump_if_true(self, mode1, mode2, mode3):
+        """Opcode 5: jump to the second parameter if the first is non-zero."""
+        if self.get_value(self.index + 1, mode1) != 0:
+            target = self.get_jump_target(mode2)
+            # Checked here so jumps that can't skip a loop cost no extra call
+            if target < self.index and self.loops.get(target) is not False:
+                self.jump_back(target)
+            else:
+                self.index = target
+        else:
+            self.index += 3
+
+    def jump_if_false(self, mode1, mode2, mode3):
+        """Opcode 6: jump to the second parameter if the first is zero."""
+        if self.get_value(self.index + 1, mode1) == 0:
+            target = self.get_jump_target(mode2)
+            if target < self.index and self.loops.get(target) is not False:
+                self.jump_back(target)
+            else:
+                self.index = target
+        else:
+            self.index += 3
+
+    def jump_back(self, target):
+        """Jump back to a target, skipping the loop the jump closes if it
+        can be solved.
+        """
+        jump = self.index
+        self.index = target
+        if not self.fast_forward:
+            return
+        loop = self.loops.get(target)
+        if loop is None or loop.jump != jump or not loop.matches(self.memory):
+            # Loops that can't be skipped are kept as False
+            loop = self.loops[target] = Loop.find(self.memory, target, jump) or False
+        if loop:
+            self.skipped_instructions += loop.skip(self)
+
+    def get_jump_target(self, mode):
+        """Return the target of a jump, which must stay inside memory."""
+        target = self.get_value(self.index + 2, mode)
+        if target < 0:
+            raise Exception(f"jump to negative address: {target}")
+        return target
+
+    def less_than(self, mode1, mode2, mode3):
+        """Opcode 7: store 1 if the first parameter is less than the second."""
+        val1 = self.get_value(self.index + 1, mode1)
+        val2 = self.get_value(self.index + 2, mode2)
+        self.set_value(self.index + 3, mode3, int(val1 < val2))
+        self.index += 4
+
+    def equals(self, mode1, mode2, mode3):
+        """Opcode 8: store 1 if both parameters are equal."""
+        val1 = self.get_value(self.index + 1, mode1)
+        val2 = self.get_value(self.index + 2, mode2)
+        self.set_value(self.index + 3, mode3, int(val1 == val2))
+        self.index += 4
+
+    def adjust_relative_base(self, mode1, mode2, mode3):
+        """Opcode 9: offset the relative base by a parameter."""
+        self.relative_base += self.get_value(self.index + 1, mode1)
+        self.index += 2
+
+    def halt(self, mode1, mode2, mode3):
+        """Opcode 99: stop the program."""
+        self.halted = True
+        raise Halt()
+
+
+# Map of opcode -> handler, so each step is a single lookup instead of
+# a chain of comparisons
+HANDLERS = {
+    1: Computer.add,
+    2: Computer.multiply,
+    3: Computer.read_input,
+    4: Computer.write_output,
+    5: Computer.jump_if_true,
+    6: Computer.jump_if_false,
+    7: Computer.less_than,
+    8: Computer.equals,
+    9: Computer.adjust_relative_base,
+    99: Computer.halt,
+}
+
+# Map of opcode -> (parameters read, parameters written), in that order
+PARAMETERS = {
+    1: (2, 1),
+    2: (2, 1),
+    3: (0, 1),
+    4: (1, 0),
+    5: (2, 0),
+    6: (2, 0),
+    7: (2, 1),
+    8: (2, 1),
+    9: (1, 0),
+    99: (0, 0),
+}
+
+
+def test():
+    memory = Memory([1, 2, 3])
+    assert memory[2] == 3
+    assert memory[3] == 0
+    assert memory[5000] == 0
+    assert len(memory.cells) == PAGE_SIZE
+    memory[1000000] = 7
+    memory[10**12] = 8
+    memory[PAGE_SIZE + 5] = 6
+    assert memory[1000000] == 7
+    assert memory[10**12] == 8
+    assert memory[1000001] == 0
+    assert memory[PAGE_SIZE + 5] == 6
+    # far writes don't grow the list, near ones grow it by whole pages
+    assert len(memory.cells) == 2 * PAGE_SIZE
+    assert memory.far == {1000000: 7, 10**12: 8}
+    try:
+        memory[-1]
+        assert False, "expected negative address to fail"
+    except Exception as exc:
+        assert "negative" in str(exc)
+
+    assert decode(1002) == (2, 0, 1, 0)
+    assert decode(21107) == (7, 1, 1, 2)
+    assert decode(99) == (99, 0, 0, 0)
+
+    memory = Memory(range(3000))
+    clone = memory.fork()
+    clone[5] = -5
+    memory[2500] = -2500
+    assert (memory[5], clone[5]) == (5, -5)
+    assert (memory[2500], clone[2500]) == (-2500, 2500)
+    assert memory.cells is not clone.cells
+    # a fork that is only read never copies
+    reader = clone.fork()
+    assert reader[5] == -5 and reader.cells is clone.cells
+
+    program = [3, 9, 8, 9, 10, 9, 4, 9, 99, -1, 8]
+    computer = Computer(program)
+    computer.inputs += [8]
+    assert computer.process() == [1]
+    assert computer.halted
+
+    # forks continue independently from the state they were taken in
+    computer = Computer(program)
+    saved = computer.snapshot()
+    forked = computer.fork()
+    computer.inputs += [8]
+    forked.inputs += [7]
+    assert computer.process() == [1]
+    assert forked.process() == [0]
+    computer.restore(saved)
+    computer.inputs += [8]
+    assert computer.process() == [1]
+
+    computer = Computer(program)
+    try:
+        computer.process()
+        assert False, "expected NeedInput"
+    except NeedInput:
+        assert computer.index == 0
+
+    program = [109, 1, 204, -1, 1001, 100, 1, 100, 1008, 100, 16, 101, 1006, 101, 0, 99]
+    computer = Computer(program)
+    assert computer.process() == program
+    assert computer.cache_misses == 6
+    assert computer.cache_hit_rate() > 0.9
+
+    # a loop that rewrites its own add (at 4) into a multiply after one pass
+    program = [1101, 1, 0, 30, 1001, 30, 2, 30, 1101, 0, 1002, 4, 1007, 30, 10, 31]
+    program += [1005, 31, 4, 4, 30, 99]
+    computer = Computer(program)
+    assert computer.process() == [12]
+    # each of the 3 passes decoded index 4 again after it was written
+    assert computer.cache_misses == 6 + 3
+
+    # running reports why it stopped instead of raising
+    computer = Computer([3, 9, 4, 9, 104, 7, 99, 0, 0, 0])
+    assert computer.run_until_outputs(1) == STATUS_INPUT
+    computer.inputs += [5]
+    assert computer.run_until_outputs(1) == STATUS_OUTPUT
+    assert computer.outputs == [5]
+    assert computer.run_until_blocked() == STATUS_HALT
+    assert computer.outputs == [5, 7]
+    assert computer.run_until_outputs(5) == STATUS_HALT
+
+    # counts cell 30 down to 0, adding 3 to cell 31 each pass
+    program = [1001, 30, -1, 30, 1001, 31, 3, 31, 1005, 30, 0, 4, 31, 4, 30, 99]
+    program += [0] * 14 + [10**6, 0]
+    computer = Computer(program)
+    assert computer.process() == [3 * 10**6, 0]
+    # the first pass runs, then the rest are skipped from its jump back
+    assert computer.skipped_instructions == 3 * (10**6 - 1)
+    assert computer.instructions_run() == 3 * 10**6 + 3
+
+    # adds 7 to a relative counter until it isn't below a limit, tracking 3x
+    program = [109, 40, 21201, 0, 7, 0, 207, 0, 50, 45, 2102, 3, 0, 46, 1005, 45, 2]
+    program += [4, 40, 4, 45, 4, 46, 99] + [0] * 16 + [5] + [0] * 9 + [10**4 + 3]
+    computer = Computer(program)
+    interpreted = Computer(program)
+    interpreted.fast_forward = False
+    assert computer.process() == interpreted.process() == [10**4 + 8, 0, 3 * 10**4 + 24]
+    assert computer.instructions_run() == interpreted.instructions_run()
+    assert computer.memory.cells == interpreted.memory.cells
+    assert computer.skipped_instructions > 0 == interpreted.skipped_instructions
+
+
+if __name__ == "__main__":
+    test()
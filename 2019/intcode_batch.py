@@ -0,0 +1,337 @@
+"""
+Intcode computer that runs one program over many inputs in lockstep.
+
+Each lane is an independent machine, with its memory held as one row of a
+2D NumPy array. Every round, lanes sharing an instruction pointer and
+instruction run it as a single vectorized operation; lanes that take a
+different branch are split off and stepped as their own group.
+"""
+
+import numpy as np
+
+from intcode import (
+    IMMEDIATE_MODE,
+    PAGE_SIZE,
+    POSITION_MODE,
+    RELATIVE_MODE,
+    Computer,
+    decode,
+)
+
+# Most memory cells (over all lanes) the batch may grow to
+MAX_CELLS = 1 << 27
+
+# Products at least this large in floating point are checked exactly, which
+# leaves a wide margin for the rounding of a float product near 2**63
+SUSPECT_PRODUCT = 2.0**62
+INT64_MIN = -(2**63)
+INT64_MAX = 2**63 - 1
+
+
+class BatchComputer:
+    """Many Intcode computers running the same program side by side.
+
+    `inputs` and `outputs` are lists with one list per lane, and work the
+    same as those of a single Computer.
+    """
+
+    def __init__(self, program, lanes):
+        width = max(len(program), 1)
+        self.memory = np.zeros((lanes, width), dtype=np.int64)
+        self.memory[:, : len(program)] = program
+        self.index = np.zeros(lanes, dtype=np.int64)
+        self.relative_base = np.zeros(lanes, dtype=np.int64)
+        self.halted = np.zeros(lanes, dtype=bool)
+        self.inputs = [[] for _ in range(lanes)]
+        self.outputs = [[] for _ in range(lanes)]
+        self.rounds = 0  # vectorized instructions run, over all groups
+
+    def __len__(self):
+        return len(self.memory)
+
+    def process(self):
+        """Run every lane until it halts or needs an input it doesn't have.
+        Returns the outputs of each lane.
+        """
+        running = ~self.halted
+        while running.any():
+            lanes = np.flatnonzero(running)
+            for index, group in split(lanes, self.index[lanes]):
+                # Memory past the end reads as 0, as it does for a single
+                # computer, so cover the longest instruction there could be
+                if index + 3 >= self.memory.shape[1]:
+                    self.reserve(np.array([index + 3]))
+                for instruction, subset in split(group, self.memory[group, index]):
+                    blocked = self.execute(subset, int(index), int(instruction))
+                    if blocked:
+                        running[blocked] = False
+            running &= ~self.halted
+        return self.outputs
+
+    def execute(self, lanes, index, instruction):
+        """Run one instruction at an index on some lanes.
+        Returns the lanes that are now waiting for input, if any.
+        """
+        opcode, mode1, mode2, mode3 = decode(instruction)
+        try:
+            handler = HANDLERS[opcode]
+        except KeyError:
+            raise Exception(f"unknown opcode {opcode} at index {index}")
+        self.rounds += 1
+        return handler(self, lanes, index, mode1, mode2, mode3)
+
+    def get_address(self, lanes, index, mode):
+        """Return the address of a parameter for each lane by index and mode."""
+        if mode == IMMEDIATE_MODE:
+            return np.full(len(lanes), index, dtype=np.int64)
+        param = self.memory[lanes, index]
+        if mode == POSITION_MODE:
+            return param
+        if mode == RELATIVE_MODE:
+            return param + self.relative_base[lanes]
+        raise Exception(f"unknown mode: {mode}")
+
+    def get_value(self, lanes, index, mode):
+        """Return the value of a parameter for each lane by index and mode."""
+        if mode == IMMEDIATE_MODE:
+            return self.memory[lanes, index]
+        addresses = self.get_address(lanes, index, mode)
+        self.reserve(addresses)
+        return self.memory[lanes, addresses]
+
+    def set_value(self, lanes, index, mode, values):
+        """Set a value for each lane at a parameter by index and mode."""
+        addresses = self.get_address(lanes, index, mode)
+        self.reserve(addresses)
+        self.memory[lanes, addresses] = values
+
+    def reserve(self, addresses):
+        """Grow every lane's memory to cover some addresses."""
+        lowest, highest = addresses.min(), addresses.max()
+        if lowest < 0:
+            raise Exception(f"negative address: {lowest}")
+        width = self.memory.shape[1]
+        if highest < width:
+            return
+
+        # Grow by whole pages, like the memory of a single computer
+        width = (int(highest) // PAGE_SIZE + 1) * PAGE_SIZE
+        if width * len(self) > MAX_CELLS:
+            raise Exception(f"batch memory too large for address {highest}")
+        memory = np.zeros((len(self), width), dtype=np.int64)
+        memory[:, : self.memory.shape[1]] = self.memory
+        self.memory = memory
+
+    def add(self, lanes, index, mode1, mode2, mode3):
+        """Opcode 1: store the sum of two parameters."""
+        val1 = self.get_value(lanes, index + 1, mode1)
+        val2 = self.get_value(lanes, index + 2, mode2)
+        total = val1 + val2
+        # Overflow flips the sign away from both (same-signed) parameters
+        if (((val1 ^ total) & (val2 ^ total)) < 0).any():
+            raise Exception(f"sum at index {index} overflows 64 bits")
+        self.set_value(lanes, index + 3, mode3, total)
+        self.index[lanes] = index + 4
+
+    def multiply(self, lanes, index, mode1, mode2, mode3):
+        """Opcode 2: store the product of two parameters."""
+        val1 = self.get_value(lanes, index + 1, mode1)
+        val2 = self.get_value(lanes, index + 2, mode2)
+        # Floats find the products that might not fit, then ints decide
+        suspect = np.abs(val1.astype(float) * val2) >= SUSPECT_PRODUCT
+        for left, right in zip(val1[suspect].tolist(), val2[suspect].tolist()):
+            if not INT64_MIN <= left * right <= INT64_MAX:
+                raise Exception(f"product at index {index} overflows 64 bits")
+        self.set_value(lanes, index + 3, mode3, val1 * val2)
+        self.index[lanes] = index + 4
+
+    def read_input(self, lanes, index, mode1, mode2, mode3):
+        """Opcode 3: store the next input of each lane that has one.
+        Returns the lanes left waiting for input.
+        """
+        waiting = [lane for lane in lanes if not self.inputs[lane]]
+        ready = np.array([lane for lane in lanes if self.inputs[lane]], dtype=int)
+        if len(ready):
+            values = [self.inputs[lane].pop(0) for lane in ready]
+            self.set_value(ready, index + 1, mode1, values)
+            self.index[ready] = index + 2
+        return waiting
+
+    def write_output(self, lanes, index, mode1, mode2, mode3):
+        """Opcode 4: add a parameter to the outputs of each lane."""
+        values = self.get_value(lanes, index + 1, mode1)
+        for lane, value in zip(lanes, values.tolist()):
+            self.outputs[lane].append(value)
+        self.index[lanes] = index + 2
+
+    def jump(self, lanes, index, mode1, mode2, condition):
+        """Jump each lane whose first parameter meets a condition."""
+        taken = condition(self.get_value(lanes, index + 1, mode1))
+        targets = self.get_value(lanes, index + 2, mode2)
+        if (targets[taken] < 0).any():
+            raise Exception(f"jump to negative address: {targets[taken].min()}")
+        self.index[lanes] = np.where(taken, targets, index + 3)
+
+    def jump_if_true(self, lanes, index, mode1, mode2, mode3):
+        """Opcode 5: jump to the second parameter if the first is non-zero."""
+        self.jump(lanes, index, mode1, mode2, lambda values: values != 0)
+
+    def jump_if_false(self, lanes, index, mode1, mode2, mode3):
+        """Opcode 6: jump to the second parameter if the first is zero."""
+        self.jump(lanes, index, mode1, mode2, lambda values: values == 0)
+
+    def less_than(self, lanes, index, mode1, mode2, mode3):
+        """Opcode 7: store 1 if the first parameter is less than the second."""
+        val1 = self.get_value(lanes, index + 1, mode1)
+        val2 = self.get_value(lanes, index + 2, mode2)
+        self.set_value(lanes, index + 3, mode3, val1 < val2)
+        self.index[lanes] = index + 4
+
+    def equals(self, lanes, index, mode1, mode2, mode3):
+        """Opcode 8: store 1 if the first parameter equals the second."""
+        val1 = self.get_value(lanes, index + 1, mode1)
+        val2 = self.get_value(lanes, index + 2, mode2)
+        self.set_value(lanes, index + 3, mode3, val1 == val2)
+        self.index[lanes] = index + 4
+
+    def adjust_relative_base(self, lanes, index, mode1, mode2, mode3):
+        """Opcode 9: add the first parameter to the relative base."""
+        self.relative_base[lanes] += self.get_value(lanes, index + 1, mode1)
+        self.index[lanes] = index + 2
+
+    def halt(self, lanes, index, mode1, mode2, mode3):
+        """Opcode 99: stop the lanes."""
+        self.halted[lanes] = True
+
+
+def split(lanes, keys):
+    """Group lanes by their keys, returning [(key, lanes with that key)]."""
+    # Lanes usually move together, which saves sorting out the keys
+    if keys.min() == keys.max():
+        return [(keys[0], lanes)]
+    return [(key, lanes[keys == key]) for key in np.unique(keys)]
+
+
+HANDLERS = {
+    1: BatchComputer.add,
+    2: BatchComputer.multiply,
+    3: BatchComputer.read_input,
+    4: BatchComputer.write_output,
+    5: BatchComputer.jump_if_true,
+    6: BatchComputer.jump_if_false,
+    7: BatchComputer.less_than,
+    8: BatchComputer.equals,
+    9: BatchComputer.adjust_relative_base,
+    99: BatchComputer.halt,
+}
+
+
+def test():
+    # compare to 8 in position and immediate mode, and a jump test, each run
+    # with lanes that take different branches
+    compare = [
+        3,
+        21,
+        1008,
+        21,
+        8,
+        20,
+        1005,
+        20,
+        22,
+        107,
+        8,
+        21,
+        20,
+        1006,
+        20,
+        31,
+        1106,
+        0,
+        36,
+        98,
+        0,
+        0,
+        1002,
+        21,
+        125,
+        20,
+        4,
+        20,
+        1105,
+        1,
+        46,
+        104,
+        999,
+        1105,
+        1,
+        46,
+        1101,
+        1000,
+        1,
+        20,
+        4,
+        20,
+        1105,
+        1,
+        46,
+        98,
+        99,
+    ]
+    programs = [
+        [3, 9, 8, 9, 10, 9, 4, 9, 99, -1, 8],
+        [3, 3, 1107, -1, 8, 3, 4, 3, 99],
+        [3, 12, 6, 12, 15, 1, 13, 14, 13, 4, 13, 99, -1, 0, 1, 9],
+        compare,
+    ]
+    for program in programs:
+        inputs = [0, 7, 8, 9, -3]
+        batch = BatchComputer(program, len(inputs))
+        for lane, value in enumerate(inputs):
+            batch.inputs[lane].append(value)
+        expected = []
+        for value in inputs:
+            computer = Computer(program)
+            computer.inputs.append(value)
+            expected.append(computer.process())
+        assert batch.process() == expected
+        assert batch.halted.all()
+
+    # quine using the relative base, growing memory past the program
+    quine = [109, 1, 204, -1, 1001, 100, 1, 100, 1008, 100, 16, 101, 1006, 101, 0, 99]
+    assert BatchComputer(quine, 3).process() == [quine] * 3
+    assert BatchComputer([1102, 34915192, 34915192, 7, 4, 7, 99, 0], 1).process() == [
+        [1219070632396864]
+    ]
+    try:
+        BatchComputer([1102, 2**62, 4, 0, 99], 1).process()
+        assert False, "expected an overflow"
+    except Exception as error:
+        assert "overflows" in str(error)
+    # products that round up to 2**63 as floats still fit
+    program = [1102, 2**62 - 1, 2, 0, 1102, -(2**62), 2, 1, 4, 0, 4, 1, 99]
+    assert BatchComputer(program, 2).process() == [[2**63 - 2, -(2**63)]] * 2
+
+    # running past the end, or jumping there, reads 0 like a single computer
+    for program in ([1101, 1, 1], [1105, 1, 50]):
+        errors = []
+        for computer in (Computer(program), BatchComputer(program, 2)):
+            try:
+                computer.process()
+                assert False, "expected an unknown opcode"
+            except Exception as error:
+                errors.append(str(error))
+        assert errors[0] == errors[1]
+
+    # lanes without input wait, and carry on once they are given some
+    batch = BatchComputer([3, 0, 4, 0, 99], 2)
+    batch.inputs[0].append(5)
+    assert batch.process() == [[5], []]
+    assert list(batch.halted) == [True, False]
+    batch.inputs[1].append(6)
+    assert batch.process() == [[5], [6]]
+    assert batch.halted.all()
+
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,246 @@
+"""
+Compact binary format for Intcode programs, and a loader for either format.
+
+A binary program is a header of (magic, cell count, escape count), then each
+cell as a little-endian int64. Values that don't fit in an int64 are stored
+as an escape cell, with the real value kept after the cells as (index, byte
+length, signed little-endian bytes). Loading maps the file and converts the
+cells in C, rather than parsing every number of the text.
+
+Usage:
+    python 2019/intcode_binary.py data/day9.txt [data/day9.icb]
+    python 2019/intcode_binary.py --benchmark [cells]
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from array import array
+
+from intcode import Computer, Memory
+
+MAGIC = b"ICB\x01"
+HEADER = struct.Struct("<4sQQ")  # magic, cell count, escape count
+ESCAPE_ENTRY = struct.Struct("<QI")  # cell index, byte length of the value
+# Marks a cell whose value is stored with the escapes, so also escaped itself
+ESCAPE = -(2**63)
+INT64_MAX = 2**63 - 1
+
+# Extension of a compiled program next to its text
+BINARY_EXTENSION = ".icb"
+
+
+def program_key(program):
+    """Return a hash of a program, to key cached or saved runs of it by."""
+    return hashlib.sha256(",".join(map(str, program)).encode()).hexdigest()
+
+
+def write_program(path, program):
+    """Write a program to a file in the binary format."""
+    with open(path, "wb") as file:
+        file.write(encode_program(program))
+
+
+def encode_program(program):
+    """Return a program encoded in the binary format."""
+    cells = array("q")
+    escapes = []
+    for index, value in enumerate(program):
+        if ESCAPE < value <= INT64_MAX:
+            cells.append(value)
+        else:
+            cells.append(ESCAPE)
+            escapes.append((index, value))
+    if sys.byteorder != "little":
+        cells.byteswap()
+
+    parts = [HEADER.pack(MAGIC, len(cells), len(escapes)), cells.tobytes()]
+    for index, value in escapes:
+        data = value.to_bytes((value.bit_length() + 8) // 8, "little", signed=True)
+        parts += [ESCAPE_ENTRY.pack(index, len(data)), data]
+    return b"".join(parts)
+
+
+def patch_list(cells, escapes):
+    """Return cells as a list of integers with their escaped values."""
+    program = cells.tolist()
+    for index, value in escapes:
+        program[index] = value
+    return program
+
+
+def read_escapes(data, offset, count):
+    """Return [(index, value)] for the escapes stored from an offset."""
+    escapes = []
+    for _ in range(count):
+        index, length = ESCAPE_ENTRY.unpack_from(data, offset)
+        offset += ESCAPE_ENTRY.size
+        value = int.from_bytes(data[offset : offset + length], "little", signed=True)
+        escapes.append((index, value))
+        offset += length
+    return escapes
+
+
+def decode_program(data, use=patch_list, offset=0):
+    """Return use(cells, escapes) for a program in the binary format, held in
+    a bytes-like object from an offset. By default returns a list.
+    `cells` is only valid during the call.
+    """
+    magic, count, escape_count = HEADER.unpack_from(data, offset)
+    if magic != MAGIC:
+        raise Exception("not a binary Intcode program")
+    start = offset + HEADER.size
+    end = start + 8 * count
+    escapes = read_escapes(data, end, escape_count)
+
+    if sys.byteorder == "little":
+        cells = memoryview(data)[start:end].cast("q")
+    else:
+        cells = array("q", data[start:end])
+        cells.byteswap()
+    try:
+        return use(cells, escapes)
+    finally:
+        if isinstance(cells, memoryview):
+            cells.release()
+
+
+def map_binary(path, use):
+    """Memory-map a binary program, and return use(cells, escapes)."""
+    with open(path, "rb") as file:
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    with data:
+        if data[: len(MAGIC)] != MAGIC:
+            raise Exception(f"not a binary Intcode program: {path}")
+        return decode_program(data, use)
+
+
+def is_binary(path):
+    """Return whether a file holds a program in the binary format."""
+    with open(path, "rb") as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def compiled_path(path):
+    """Return the path of the binary program that would sit next to a text one."""
+    return os.path.splitext(path)[0] + BINARY_EXTENSION
+
+
+def find_program(path):
+    """Return the file to load for a program path, preferring a compiled copy
+    that is at least as new as the text.
+    """
+    binary = compiled_path(path)
+    if binary == path or not os.path.exists(binary):
+        return path
+    if os.path.exists(path) and os.path.getmtime(path) > os.path.getmtime(binary):
+        return path
+    return binary
+
+
+def load_program(path):
+    """Return a program from a text or binary file as a list of integers."""
+    path = find_program(path)
+    if not is_binary(path):
+        with open(path, "r") as file:
+            text = file.read().strip()
+        return [int(number) for number in text.split(",")]
+
+    return map_binary(path, patch_list)
+
+
+def load_memory(path):
+    """Return a program from a text or binary file loaded into Memory.
+    Binary programs are copied straight from the mapped file.
+    """
+    path = find_program(path)
+    if not is_binary(path):
+        return Memory(load_program(path))
+
+    def to_memory(cells, escapes):
+        memory = Memory(cells)
+        for index, value in escapes:
+            memory.write(index, value)
+        return memory
+
+    return map_binary(path, to_memory)
+
+
+def convert(text_path, binary_path=None):
+    """Convert a text program to the binary format, returning the new path."""
+    if binary_path is None:
+        binary_path = compiled_path(text_path)
+    write_program(binary_path, load_program(text_path))
+    return binary_path
+
+
+def benchmark(cells=1_000_000):
+    """Print how long a generated program of some size takes to load."""
+    program = [(index * 7919) % 200_000 - 100_000 for index in range(cells)]
+    program[1] = 2**70
+    with tempfile.TemporaryDirectory() as folder:
+        text_path = os.path.join(folder, "program.txt")
+        with open(text_path, "w") as file:
+            file.write(",".join(map(str, program)))
+        binary_path = convert(text_path, os.path.join(folder, "program.bin"))
+
+        timings = [
+            ("text -> list", lambda: load_program(text_path)),
+            ("binary -> list", lambda: load_program(binary_path)),
+            ("text -> Memory", lambda: load_memory(text_path)),
+            ("binary -> Memory", lambda: load_memory(binary_path)),
+        ]
+        print(f"{cells} cells")
+        for label, load in timings:
+            best = None
+            for _ in range(3):
+                start = time.perf_counter()
+                load()
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            print(f"{label:>18}: {best * 1000:8.1f}ms")
+
+
+def test():
+    program = [109, 1, 204, -1, 1001, 100, 1, 100, 1008, 100, 16, 101, 1006, 101, 0]
+    program += [99, ESCAPE, INT64_MAX, -INT64_MAX, 2**64, -(2**100), 0]
+
+    with tempfile.TemporaryDirectory() as folder:
+        text_path = os.path.join(folder, "program.txt")
+        with open(text_path, "w") as file:
+            file.write(",".join(map(str, program)) + "\n")
+        assert load_program(text_path) == program
+
+        # the compiled copy is found next to the text, and round-trips exactly
+        binary_path = convert(text_path)
+        assert binary_path == os.path.join(folder, "program.icb")
+        assert is_binary(binary_path) and not is_binary(text_path)
+        assert find_program(text_path) == binary_path
+        assert load_program(binary_path) == program
+        assert load_program(text_path) == program
+        memory = load_memory(text_path)
+        assert [memory[index] for index in range(len(program))] == program
+
+        # a loaded program runs the same as the original
+        assert Computer(load_memory(binary_path)).process() == program[:16]
+
+        # text edited after converting is loaded instead of the stale copy
+        os.utime(binary_path, (0, 0))
+        with open(text_path, "w") as file:
+            file.write("104,5,99")
+        assert load_program(text_path) == [104, 5, 99]
+
+        write_program(binary_path, [])
+        assert load_program(binary_path) == []
+
+
+if __name__ == "__main__":
+    test()
+    if sys.argv[1:2] == ["--benchmark"]:
+        benchmark(*[int(value) for value in sys.argv[2:3]])
+    elif len(sys.argv) > 1:
+        print(f"wrote {convert(*sys.argv[1:3])}")
@@ -0,0 +1,200 @@
+"""
+Checkpoints of Intcode computers, saved to disk and resumed exactly.
+
+A checkpoint file is a header of (magic, version, metadata length), then the
+metadata as JSON (registers, pending inputs and outputs, and any state of the
+program driving the computer), then the list of memory cells followed by the
+values of any far cells, in the binary program format of intcode_binary.
+"""
+
+import json
+import os
+import struct
+import tempfile
+
+from intcode import Computer, Memory
+from intcode_binary import decode_program, encode_program, program_key
+
+MAGIC = b"ICKP"
+VERSION = 2
+HEADER = struct.Struct("<4sHI")  # magic, version, metadata length
+
+
+def save_checkpoint(path, computer, state=None, key=None):
+    """Save a computer, and a JSON-compatible state of its driver, to a file.
+    `key` can be the program_key of the program it runs, to check before
+    resuming. Writes a new file over the old one, so a crash never leaves
+    half a file.
+    """
+    memory = computer.memory
+    far = sorted(memory.far)
+    cells = memory.cells + [memory.far[address] for address in far]
+
+    metadata = json.dumps(
+        {
+            "index": computer.index,
+            "relative_base": computer.relative_base,
+            "halted": computer.halted,
+            "inputs": computer.inputs,
+            "outputs": computer.outputs,
+            "instructions": computer.instructions_run(),
+            "cells": len(memory.cells),
+            "far": far,
+            "key": key,
+            "state": state,
+        }
+    ).encode()
+
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(metadata)))
+        file.write(metadata)
+        file.write(encode_program(cells))
+    os.replace(temporary, path)
+
+
+def read_metadata(data, path):
+    """Return the metadata of a checkpoint's contents, and where its memory
+    starts.
+    """
+    magic, version, length = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise Exception(f"not an Intcode checkpoint: {path}")
+    if version != VERSION:
+        raise Exception(f"unsupported checkpoint version {version}: {path}")
+    metadata = json.loads(data[HEADER.size : HEADER.size + length])
+    return metadata, HEADER.size + length
+
+
+def checkpoint_key(path):
+    """Return the key a checkpoint file was saved with, or None."""
+    with open(path, "rb") as file:
+        data = file.read()
+    return read_metadata(data, path)[0].get("key")
+
+
+def load_checkpoint(path, computer_class=Computer):
+    """Return (computer, driver state) resumed from a checkpoint file.
+    The computer is made of computer_class, and continues exactly where the
+    saved one was when it was checkpointed.
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    metadata, offset = read_metadata(data, path)
+    cells = decode_program(data, offset=offset)
+
+    near = metadata["cells"]
+    memory = Memory(cells[:near])
+    memory.far = dict(zip(metadata["far"], cells[near:]))
+
+    computer = computer_class(memory)
+    computer.index = metadata["index"]
+    computer.relative_base = metadata["relative_base"]
+    computer.halted = metadata["halted"]
+    computer.inputs = metadata["inputs"]
+    computer.outputs = metadata["outputs"]
+    # So instructions_run carries on from the save
+    computer.resumed_instructions = metadata["instructions"]
+    return computer, metadata["state"]
+
+
+class Checkpointer:
+    """Saves a computer to a file whenever `interval` more instructions have
+    run since its last save, with the key of its program if given.
+    """
+
+    def __init__(self, path, interval=1_000_000, key=None):
+        self.path = path
+        self.interval = interval
+        self.key = key
+        self.saved_at = None  # instructions run at the last save
+        self.saves = 0
+
+    def due(self, computer):
+        """Return whether enough instructions ran since the last save."""
+        ran = computer.instructions_run()
+        if self.saved_at is None:
+            self.saved_at = ran
+        return ran - self.saved_at >= self.interval
+
+    def update(self, computer, state=None):
+        """Save the computer and its driver state if enough instructions ran.
+        The state may be a function returning it, called only when saving.
+        Returns whether it saved.
+        """
+        if not self.due(computer):
+            return False
+        self.save(computer, state() if callable(state) else state)
+        return True
+
+    def save(self, computer, state=None):
+        """Save the computer and its driver state now."""
+        save_checkpoint(self.path, computer, state, self.key)
+        self.saved_at = computer.instructions_run()
+        self.saves += 1
+
+
+def test():
+    # count to 5, outputting each number and writing far past the program
+    program = [1101, 0, 0, 30, 1001, 30, 1, 30, 4, 30, 21101, 7, 0, 10**6]
+    program += [1007, 30, 5, 31, 1005, 31, 4, 99] + [0] * 10
+    expected = Computer(program)
+    expected.relative_base = 2**70
+    expected.process()
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "computer.ckpt")
+        computer = Computer(program)
+        computer.relative_base = 2**70
+        while len(computer.outputs) < 3:
+            computer.step()
+        computer.inputs += [2**80]
+        state = {"score": 12, "grid": [[1, 2, 3]]}
+        save_checkpoint(path, computer, state, program_key(program))
+
+        assert checkpoint_key(path) == program_key(program)
+        resumed, state = load_checkpoint(path)
+        assert state == {"score": 12, "grid": [[1, 2, 3]]}
+        assert resumed.instructions_run() == computer.instructions_run()
+        # the instructions run before aren't counted as cache misses
+        assert resumed.cache_misses == 0 and resumed.cache_hit_rate() == 0.0
+        assert resumed.inputs == [2**80]
+        assert resumed.memory.far == computer.memory.far
+        assert resumed.process() == computer.process() == expected.outputs
+        assert resumed.memory.read(2**70 + 10**6) == 7
+        assert resumed.memory.cells == expected.memory.cells
+
+        # checkpoints are only saved once enough instructions have run
+        computer = Computer(program)
+        checkpointer = Checkpointer(path, interval=10)
+        saved = []
+        states = []
+
+        def state():
+            states.append(len(states))
+            return states[-1]
+
+        while not computer.halted:
+            computer.run_until_outputs(len(computer.outputs) + 1)
+            saved.append(checkpointer.update(computer, state))
+        # outputs come after 3 instructions then every 5, and it halts at 27
+        assert saved == [False, False, True, False, True, False]
+        # the state is only built for the two saves
+        resumed, state = load_checkpoint(path)
+        assert states == [0, 1] and state == 1
+        assert checkpoint_key(path) is None
+        assert resumed.instructions_run() == 23
+        assert resumed.outputs == [1, 2, 3, 4, 5] and not resumed.halted
+        assert resumed.process() == [1, 2, 3, 4, 5] and resumed.halted
+
+        with open(path, "r+b") as file:
+            file.write(struct.pack("<4sH", MAGIC, VERSION + 1))
+        try:
+            load_checkpoint(path)
+            assert False, "expected an unsupported version"
+        except Exception as error:
+            assert "version" in str(error)
+
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,390 @@
+"""
+Disassembler and control flow analysis for Intcode programs.
+
+Follows the program from its entry point rather than decoding every cell,
+so data isn't mistaken for code. Jumps to an immediate target are followed
+directly. Jumps through memory (like returning from a function) can't be,
+so when a program has any, constants it stores that point at valid
+instructions are followed as well.
+
+Usage: python 2019/intcode_disasm.py data/day9.txt
+"""
+
+import sys
+
+from intcode import IMMEDIATE_MODE, PARAMETERS, POSITION_MODE, RELATIVE_MODE, decode
+from intcode_binary import load_program
+
+MNEMONICS = {
+    1: "add",
+    2: "mul",
+    3: "in",
+    4: "out",
+    5: "jnz",
+    6: "jz",
+    7: "lt",
+    8: "eq",
+    9: "arb",
+    99: "halt",
+}
+
+
+class Instruction:
+    """One decoded instruction with its raw parameters."""
+
+    def __init__(self, index, value, params):
+        self.index = index
+        self.value = value
+        self.opcode, *self.modes = decode(value)
+        self.reads, self.writes = PARAMETERS[self.opcode]
+        self.params = params
+        self.size = 1 + len(params)
+
+    def operand(self, param):
+        """Return the text of a parameter: 5, [5] or [rb+5] by mode."""
+        value = self.params[param]
+        mode = self.modes[param]
+        if mode == IMMEDIATE_MODE:
+            return str(value)
+        if mode == RELATIVE_MODE:
+            return f"[rb{value:+d}]"
+        return f"[{value}]"
+
+    def write_address(self):
+        """Return the address the instruction writes, or None if it writes
+        nothing or the address depends on the relative base.
+        """
+        if not self.writes:
+            return None
+        mode = self.modes[self.reads]
+        if mode == RELATIVE_MODE:
+            return None
+        if mode == IMMEDIATE_MODE:
+            # An immediate write stores into the parameter's own cell
+            return self.index + 1 + self.reads
+        return self.params[self.reads]
+
+    def is_jump(self):
+        return self.opcode in (5, 6)
+
+    def jump_target(self):
+        """Return the target of a jump given as an immediate, or None."""
+        if self.is_jump() and self.modes[1] == IMMEDIATE_MODE:
+            return self.params[1]
+        return None
+
+    def jump_taken(self):
+        """Return whether a jump is always taken (True), never (False), or
+        depends on memory (None).
+        """
+        if self.modes[0] != IMMEDIATE_MODE:
+            return None
+        return (self.params[0] != 0) == (self.opcode == 5)
+
+    def cells(self):
+        """Return the range of addresses the instruction is stored in."""
+        return range(self.index, self.index + self.size)
+
+    def __str__(self):
+        operands = ", ".join(self.operand(param) for param in range(len(self.params)))
+        return f"{MNEMONICS[self.opcode]} {operands}".rstrip()
+
+
+class Block:
+    """A basic block: instructions that always run in order from the first.
+    `successors` holds every start the block may continue at that is known,
+    and `indirect` whether it can also jump to a target held in memory.
+    """
+
+    def __init__(self, start, instructions):
+        self.start = start
+        self.instructions = instructions
+        self.end = instructions[-1].index + instructions[-1].size
+        self.successors = []
+        self.indirect = False
+
+    @property
+    def last(self):
+        return self.instructions[-1]
+
+
+class Analysis:
+    """What is known about a program without running it."""
+
+    def __init__(self, program, entries=(0,)):
+        self.program = list(program)
+        self.entries = list(entries)
+        self.instructions = {}  # index -> Instruction of every reachable one
+        self.jump_targets = set()  # immediate targets of jumps
+        self.pointer_targets = set()  # stored constants followed as targets
+        self.indirect_jumps = []  # indexes of jumps to a target in memory
+        self.write_targets = {}  # address -> indexes of instructions writing it
+        self.relative_writes = []  # indexes of writes relative to the base
+        self.invalid = set()  # reachable indexes that don't decode
+        self.blocks = {}  # start -> Block
+
+        self.trace(self.entries)
+        # Values stored that point at code may be jumped to through memory
+        while self.indirect_jumps:
+            pointers = [
+                target
+                for target in self.stored_constants()
+                if target not in self.instructions and target not in self.invalid
+                if decode_at(self.program, target) is not None
+            ]
+            if not pointers:
+                break
+            self.pointer_targets.update(pointers)
+            self.trace(pointers)
+        self.build_blocks()
+
+    def trace(self, entries):
+        """Decode every instruction reachable from some entry indexes."""
+        pending = list(entries)
+        while pending:
+            index = pending.pop()
+            while index not in self.instructions:
+                instruction = decode_at(self.program, index)
+                if instruction is None:
+                    self.invalid.add(index)
+                    break
+                self.add(instruction)
+                if instruction.opcode == 99:
+                    break
+                if instruction.is_jump():
+                    taken = instruction.jump_taken()
+                    target = instruction.jump_target()
+                    if target is None:
+                        self.indirect_jumps.append(index)
+                    elif taken is not False:
+                        self.jump_targets.add(target)
+                        pending.append(target)
+                    if taken:
+                        break
+                index += instruction.size
+
+    def add(self, instruction):
+        """Record a reachable instruction and the memory it writes."""
+        self.instructions[instruction.index] = instruction
+        if instruction.writes:
+            address = instruction.write_address()
+            if address is None:
+                self.relative_writes.append(instruction.index)
+            else:
+                self.write_targets.setdefault(address, []).append(instruction.index)
+
+    def stored_constants(self):
+        """Return values that reachable instructions store from immediates."""
+        values = set()
+        for instruction in self.instructions.values():
+            if (
+                instruction.opcode in (1, 2)
+                and instruction.modes[:2] == [IMMEDIATE_MODE] * 2
+            ):
+                left, right = instruction.params[:2]
+                values.add(left + right if instruction.opcode == 1 else left * right)
+        return sorted(value for value in values if 0 <= value < len(self.program))
+
+    def build_blocks(self):
+        """Split the reachable instructions into basic blocks."""
+        leaders = set(self.entries) | self.jump_targets | self.pointer_targets
+        for instruction in self.instructions.values():
+            if instruction.is_jump():
+                leaders.add(instruction.index + instruction.size)
+
+        for start in sorted(leaders):
+            if start not in self.instructions:
+                continue
+            instructions = [self.instructions[start]]
+            while True:
+                last = instructions[-1]
+                following = last.index + last.size
+                if last.opcode == 99 or last.is_jump():
+                    break
+                if following in leaders or following not in self.instructions:
+                    break
+                instructions.append(self.instructions[following])
+
+            block = self.blocks[start] = Block(start, instructions)
+            last = block.last
+            taken = last.jump_taken() if last.is_jump() else False
+            if last.is_jump() and last.jump_target() is None:
+                block.indirect = True
+            elif taken is not False:
+                block.successors.append(last.jump_target())
+            if last.opcode != 99 and not taken and block.end in self.instructions:
+                block.successors.append(block.end)
+
+    def code_cells(self):
+        """Return the set of addresses holding reachable instructions."""
+        return {cell for ins in self.instructions.values() for cell in ins.cells()}
+
+    def self_modifying(self):
+        """Return the sorted addresses of code that some instruction writes."""
+        code = self.code_cells()
+        return sorted(address for address in self.write_targets if address in code)
+
+    def writes_known(self):
+        """Return whether every write the program can make was found.
+        Code reached only by jumps through memory may never have been
+        traced, and code written by the program may write somewhere else
+        once changed, so neither can be ruled out. That includes cells that
+        don't decode yet but are reached, which a write can turn into code.
+        """
+        if self.indirect_jumps or self.self_modifying():
+            return False
+        reached = self.invalid | self.jump_targets | self.pointer_targets
+        return not reached.intersection(self.write_targets)
+
+    def may_write(self, address):
+        """Return whether the program might ever write an address.
+        Any write relative to the base might write anywhere, and so might
+        any program whose writes aren't all known.
+        """
+        if self.relative_writes or not self.writes_known():
+            return True
+        return address in self.write_targets
+
+    def is_stable(self, start):
+        """Return whether no write can ever change the block at a start, so an
+        engine may run it without checking for changes to its code.
+        """
+        block = self.blocks[start]
+        return not any(
+            self.may_write(cell) for ins in block.instructions for cell in ins.cells()
+        )
+
+    def listing(self):
+        """Return the disassembled program as text, one instruction a line.
+        Blocks are labelled with their successors, and instructions written
+        by the program are marked with a *.
+        """
+        written = set(self.write_targets)
+        lines = []
+        index = 0
+        for start in sorted(self.instructions):
+            if start > index:
+                lines.append(f"{index:>8}  ; {start - index} cells of data")
+            if start in self.blocks:
+                block = self.blocks[start]
+                exits = [str(successor) for successor in block.successors]
+                if block.indirect:
+                    exits.append("?")
+                lines.append(f"block {start}: -> {', '.join(exits) or 'halt'}")
+            instruction = self.instructions[start]
+            mark = "*" if written.intersection(instruction.cells()) else " "
+            cells = ",".join(str(self.program[cell]) for cell in instruction.cells())
+            lines.append(f"{start:>8} {mark} {str(instruction):<32} ; {cells}")
+            index = max(index, start + instruction.size)
+        if index < len(self.program):
+            lines.append(f"{index:>8}  ; {len(self.program) - index} cells of data")
+        return "\n".join(lines)
+
+
+def decode_at(program, index):
+    """Return the Instruction stored at an index, or None if it isn't one."""
+    if not 0 <= index < len(program):
+        return None
+    value = program[index]
+    opcode, *modes = decode(value)
+    if value < 0 or opcode not in PARAMETERS or value >= 100000:
+        return None
+    reads, writes = PARAMETERS[opcode]
+    count = reads + writes
+    if any(
+        mode not in (POSITION_MODE, IMMEDIATE_MODE, RELATIVE_MODE) for mode in modes
+    ):
+        return None
+    if any(modes[param] for param in range(count, 3)):
+        return None
+    params = list(program[index + 1 : index + 1 + count])
+    params += [0] * (count - len(params))
+    return Instruction(index, value, params)
+
+
+def analyze(program, entries=(0,)):
+    """Return the Analysis of a program run from some entry indexes."""
+    return Analysis(program, entries)
+
+
+def test():
+    # outputs a copy of itself, looping back with a jump to 0
+    program = [109, 1, 204, -1, 1001, 100, 1, 100, 1008, 100, 16, 101, 1006, 101]
+    program += [0, 99]
+    analysis = analyze(program)
+    assert [str(ins) for ins in analysis.instructions.values()] == [
+        "arb 1",
+        "out [rb-1]",
+        "add [100], 1, [100]",
+        "eq [100], 16, [101]",
+        "jz [101], 0",
+        "halt",
+    ]
+    assert sorted(analysis.blocks) == [0, 15]
+    assert analysis.blocks[0].successors == [0, 15]
+    assert analysis.jump_targets == {0}
+    assert analysis.write_targets == {100: [4], 101: [8]}
+    assert analysis.self_modifying() == []
+    assert analysis.is_stable(0) and analysis.is_stable(15)
+
+    # calls a function that returns through the stack, past data at 10
+    program = [109, 20, 21101, 0, 9, 0, 1105, 1, 11, 99, 42, 104, 5, 2106, 0, 0]
+    analysis = analyze(program)
+    assert sorted(analysis.instructions) == [0, 2, 6, 9, 11, 13]
+    assert analysis.indirect_jumps == [13] and analysis.pointer_targets == {9}
+    assert analysis.blocks[0].successors == [11]
+    assert analysis.blocks[11].indirect and analysis.blocks[11].successors == []
+    assert analysis.blocks[9].successors == []
+    assert analysis.relative_writes == [2]
+    assert not analysis.is_stable(0)
+    lines = analysis.listing().splitlines()
+    assert lines[0] == "block 0: -> 11"
+    assert "add 0, 9, [rb+0]" in lines[2]
+    assert lines[6] == "      10  ; 1 cells of data"
+    assert lines[7] == "block 11: -> ?"
+
+    # writes over its own output's parameter, and into its own parameter
+    program = [1101, 1, 1, 5, 104, 0, 1, 0, 0, 9, 99]
+    analysis = analyze(program)
+    assert analysis.self_modifying() == [5, 9]
+    assert not analysis.is_stable(0)
+    assert "*" in analysis.listing().splitlines()[2]
+
+    # a jump through memory reaches code that was never traced, which
+    # writes over the first block when run
+    program = [6, 20, 21, 99, 0, 0, 0, 0, 1101, 1, 1, 1, 99] + [0] * 7 + [0, 8]
+    analysis = analyze(program)
+    assert analysis.write_targets == {} and analysis.indirect_jumps == [0]
+    assert not analysis.writes_known()
+    assert analysis.may_write(1) and not analysis.is_stable(0)
+
+    # a reached cell that doesn't decode until the program writes code into
+    # it, which then writes over the first block
+    program = [1101, 0, 1101, 8, 1105, 1, 8, 99, 0, 7, 7, 0, 99]
+    analysis = analyze(program)
+    assert analysis.write_targets == {8: [0]} and analysis.invalid == {8}
+    assert analysis.self_modifying() == []
+    assert not analysis.writes_known()
+    assert analysis.may_write(0) and not analysis.is_stable(0)
+
+    # invalid code is noted where it is reached, and data is never decoded
+    analysis = analyze([1105, 1, 4, 12345, 77])
+    assert analysis.invalid == {4}
+    assert sorted(analysis.instructions) == [0]
+
+
+def main(path):
+    """Print the disassembly of a program file and a summary of it."""
+    analysis = analyze(load_program(path))
+    print(analysis.listing())
+    print()
+    print(f"{len(analysis.instructions)} instructions in {len(analysis.blocks)} blocks")
+    print(f"{len(analysis.indirect_jumps)} jumps through memory")
+    print(f"{len(analysis.relative_writes)} writes relative to the base")
+    print(f"code written at: {analysis.self_modifying()}")
+
+
+if __name__ == "__main__":
+    test()
+    if len(sys.argv) > 1:
+        main(sys.argv[1])
@@ -0,0 +1,401 @@
+"""
+Intcode computer that compiles basic blocks of a program into Python functions.
+
+A block is a run of instructions from a jump target up to the next jump,
+input, output or halt. Its parameters are resolved once when it is compiled,
+so running it skips decoding and dispatching each instruction.
+"""
+
+from intcode import (
+    IMMEDIATE_MODE,
+    POSITION_MODE,
+    RELATIVE_MODE,
+    STATUS_HALT,
+    STATUS_INPUT,
+    STATUS_OUTPUT,
+    Computer,
+    decode,
+)
+
+# Longest run of instructions compiled into a single block
+MAX_BLOCK_INSTRUCTIONS = 200
+
+# Expressions for opcodes that store a result, given the two parameter values
+STORE_EXPRESSIONS = {
+    1: "{} + {}",
+    2: "{} * {}",
+    7: "(1 if {} < {} else 0)",
+    8: "(1 if {} == {} else 0)",
+}
+
+
+class CompiledComputer(Computer):
+    """An Intcode computer that runs compiled blocks instead of single steps.
+
+    Any write into memory covered by a compiled block throws that block
+    away, so programs that modify their own code still run correctly.
+    """
+
+    def __init__(self, program):
+        super().__init__(program)
+        # {start index -> (function or None, end index)} for compiled blocks,
+        # where None marks a start that has to be interpreted
+        self.blocks = {}
+        # {index -> set of block starts} for every cell covered by a block
+        self.code_owners = {}
+        self.compiled_instructions = 0  # instructions run inside blocks
+
+    def restore(self, snapshot):
+        """Return to the state saved in a snapshot, dropping compiled blocks."""
+        super().restore(snapshot)
+        self.blocks = {}
+        self.code_owners = {}
+
+    def step(self):
+        """Run the block at the instruction pointer, or a single instruction if
+        the block can't be compiled (input, output and halt are interpreted).
+        """
+        try:
+            function, end = self.blocks[self.index]
+        except KeyError:
+            function, end = self.compile(self.index)
+        if function is None:
+            super().step()
+        else:
+            self.index = function(self)
+
+    def run(self, count):
+        """Run blocks until `outputs` holds at least `count` values.
+        Raises Halt and NeedInput the same as step.
+        """
+        if self.step.__func__ is not CompiledComputer.step:
+            return super().run(count)
+
+        # Same as calling step, but with the lookups kept in locals. Blocks
+        # never output, so outputs are only counted after interpreted steps
+        outputs = self.outputs
+        blocks = self.blocks
+        while len(outputs) < count:
+            try:
+                function, end = blocks[self.index]
+            except KeyError:
+                function, end = self.compile(self.index)
+            while function is not None:
+                self.index = function(self)
+                try:
+                    function, end = blocks[self.index]
+                except KeyError:
+                    function, end = self.compile(self.index)
+            Computer.step(self)
+
+    def instructions_run(self):
+        """Return how many instructions this computer has run."""
+        return super().instructions_run() + self.compiled_instructions
+
+    def set_value(self, index, mode, value):
+        """Set a value into the program, dropping any blocks compiled over it."""
+        address = self.get_address(index, mode)
+        super().set_value(index, mode, value)
+        if address in self.code_owners:
+            self.invalidate(address)
+
+    def invalidate(self, address):
+        """Drop every compiled block and decoded instruction covering an address."""
+        self.decoded.pop(address, None)
+        for start in list(self.code_owners.get(address, ())):
+            function, end = self.blocks.pop(start)
+            for covered in range(start, end):
+                owners = self.code_owners[covered]
+                owners.discard(start)
+                if not owners:
+                    del self.code_owners[covered]
+
+    def compile(self, start):
+        """Compile the block starting at an index and return (function, end)."""
+        source, end = BlockCompiler(self, start).compile()
+        if source is None:
+            function = None
+        else:
+            namespace = {}
+            exec(compile(source, f"<intcode block {start}>", "exec"), namespace)
+            function = namespace["block"]
+
+        self.blocks[start] = (function, end)
+        for covered in range(start, end):
+            self.code_owners.setdefault(covered, set()).add(start)
+        return function, end
+
+
+class BlockCompiler:
+    """Generates the Python source of one block of an Intcode program."""
+
+    def __init__(self, computer, start):
+        self.memory = computer.memory
+        self.start = start
+        self.lines = []
+        self.instructions = 0  # compiled so far, counted when leaving a block
+        self.uses_relative_base = False
+        self.changes_relative_base = False
+        # {index -> instructions run up to and including it} for each
+        # instruction compiled, to count them if one of them raises
+        self.counts = {}
+
+    def compile(self):
+        """Return (source of a `block(computer)` function or None, end index)."""
+        index = self.start
+        for _ in range(MAX_BLOCK_INSTRUCTIONS):
+            opcode, mode1, mode2, mode3 = decode(self.memory.read(index))
+            modes = (mode1, mode2, mode3)
+            if any(
+                mode not in (POSITION_MODE, IMMEDIATE_MODE, RELATIVE_MODE)
+                for mode in modes
+            ):
+                break
+            if opcode in STORE_EXPRESSIONS or opcode in (5, 6, 9):
+                self.instructions += 1
+                self.counts[index] = self.instructions
+                self.lines.append(f"at = {index}")
+
+            if opcode in STORE_EXPRESSIONS:
+                val1 = self.value(index + 1, mode1)
+                val2 = self.value(index + 2, mode2)
+                expression = STORE_EXPRESSIONS[opcode].format(val1, val2)
+                self.store(index + 3, mode3, expression, index + 4)
+                index += 4
+            elif opcode == 9:
+                self.changes_relative_base = True
+                self.lines.append(f"rb += {self.value(index + 1, mode1)}")
+                index += 2
+            elif opcode in (5, 6):
+                test = "!=" if opcode == 5 else "=="
+                self.lines += [
+                    f"if {self.value(index + 1, mode1)} {test} 0:",
+                    f"    target = {self.value(index + 2, mode2)}",
+                    "    if target < 0:",
+                    '        raise Exception(f"jump to negative address: {target}")',
+                    *self.exit("target", indent="    "),
+                ]
+                index += 3
+                self.lines += self.exit(index)
+                return self.source(), index
+            else:
+                # input, output, halt and unknown opcodes end the block
+                break
+
+        if not self.lines:
+            return None, self.start + 1
+        self.lines += self.exit(index)
+        return self.source(), index
+
+    def source(self):
+        """Return the source of the function for the compiled lines."""
+        header = [
+            "def block(computer):",
+            "    memory = computer.memory",
+            "    cells = memory.cells",
+            "    owned = memory.owned",
+            "    read = memory.read",
+        ]
+        if self.uses_relative_base or self.changes_relative_base:
+            header.append("    rb = computer.relative_base")
+        # An instruction that raises (like reading a negative address) leaves
+        # the computer at that instruction, as the interpreter would, with
+        # the writes and relative base changes before it kept
+        handler = [
+            "except Exception:",
+            "    computer.index = at",
+            f"    computer.compiled_instructions += {self.counts!r}[at]",
+        ]
+        if self.changes_relative_base:
+            handler.append("    computer.relative_base = rb")
+        handler.append("    raise")
+        body = ["try:"] + ["    " + line for line in self.lines] + handler
+        return "\n".join(header + ["    " + line for line in body]) + "\n"
+
+    def exit(self, next_index, indent=""):
+        """Return lines that leave the block and continue at next_index."""
+        lines = [f"{indent}computer.compiled_instructions += {self.instructions}"]
+        if self.changes_relative_base:
+            lines.append(f"{indent}computer.relative_base = rb")
+        lines.append(f"{indent}return {next_index}")
+        return lines
+
+    def write(self, indent=""):
+        """Return lines that write value to address through the memory."""
+        # Writing may copy a shared list, which the block reads from after
+        return [
+            f"{indent}memory.write(address, value)",
+            f"{indent}cells = memory.cells",
+            f"{indent}owned = memory.owned",
+        ]
+
+    def value(self, index, mode):
+        """Return an expression for a parameter value by index and mode."""
+        param = self.memory.read(index)
+        if mode == IMMEDIATE_MODE:
+            return repr(param)
+        if mode == RELATIVE_MODE:
+            self.uses_relative_base = True
+            return f"read(rb + {param})"
+        # The list of cells never shrinks, so existing ones can be indexed
+        if 0 <= param < len(self.memory.cells):
+            return f"cells[{param}]"
+        return f"read({param})"
+
+    def store(self, index, mode, expression, next_index):
+        """Add lines that store an expression at a parameter by index and mode."""
+        param = self.memory.read(index)
+        self.lines.append(f"value = {expression}")
+        if mode == RELATIVE_MODE:
+            self.uses_relative_base = True
+            self.lines += [
+                f"address = rb + {param}",
+                *self.write(),
+            ]
+        elif mode == POSITION_MODE and 0 <= param < len(self.memory.cells):
+            self.lines += [
+                f"address = {param}",
+                "if owned:",
+                f"    cells[{param}] = value",
+                "else:",
+                *self.write(indent="    "),
+            ]
+        else:
+            address = index if mode == IMMEDIATE_MODE else param
+            self.lines += [
+                f"address = {address}",
+                *self.write(),
+            ]
+
+        # Writing over compiled or decoded code drops it and leaves this block
+        # early, since the rest of the block may have just been changed
+        self.lines += [
+            "if address in computer.code_owners or address in computer.decoded:",
+            "    computer.invalidate(address)",
+            *self.exit(next_index, indent="    "),
+        ]
+
+
+def test():
+    programs = [
+        # compare to 8, with input 7, 8 and 9
+        ([3, 9, 8, 9, 10, 9, 4, 9, 99, -1, 8], [7]),
+        ([3, 9, 8, 9, 10, 9, 4, 9, 99, -1, 8], [8]),
+        ([3, 3, 1107, -1, 8, 3, 4, 3, 99], [9]),
+        # quine, using the relative base
+        (
+            [109, 1, 204, -1, 1001, 100, 1, 100, 1008, 100, 16, 101, 1006, 101, 0, 99],
+            [],
+        ),
+        ([1102, 34915192, 34915192, 7, 4, 7, 99, 0], []),
+        # counting loop that adds one more each time by rewriting its own
+        # immediate parameter (cell 6) inside the compiled block
+        (
+            [
+                1101,
+                0,
+                0,
+                30,
+                1001,
+                30,
+                1,
+                30,
+                1001,
+                6,
+                1,
+                6,
+                1007,
+                30,
+                100,
+                31,
+                1005,
+                31,
+                4,
+                4,
+                30,
+                99,
+            ],
+            [],
+        ),
+        # loop that rewrites its own add into a multiply via the relative base
+        (
+            [
+                109,
+                4,
+                1101,
+                0,
+                1,
+                30,
+                1001,
+                30,
+                1,
+                30,
+                21101,
+                0,
+                2,
+                2,
+                1007,
+                30,
+                50,
+                31,
+                1005,
+                31,
+                6,
+                4,
+                30,
+                99,
+            ],
+            [],
+        ),
+    ]
+    for program, inputs in programs:
+        interpreted = Computer(program)
+        interpreted.inputs += inputs
+        compiled = CompiledComputer(program)
+        compiled.inputs += inputs
+        assert compiled.process() == interpreted.process()
+        assert compiled.relative_base == interpreted.relative_base
+
+    # an instruction that raises inside a block leaves the computer at that
+    # instruction, with what the block did before it kept
+    errors = [
+        # reads a negative address after moving the relative base
+        [109, 4, 101, 42, -1, 47, 99],
+        # writes, then jumps to a negative address
+        [1101, 2, 3, 20, 1105, 1, -2, 99],
+    ]
+    for program in errors:
+        states = []
+        for computer in (Computer(program), CompiledComputer(program)):
+            try:
+                computer.process()
+                assert False, "expected a negative address"
+            except Exception as error:
+                assert "negative" in str(error)
+            states.append(
+                (
+                    computer.index,
+                    computer.relative_base,
+                    computer.memory.read(20),
+                    computer.instructions_run(),
+                )
+            )
+        assert states[0] == states[1]
+    assert states[1] == (4, 0, 5, 2)
+
+    # running stops for input and output the same as the interpreter
+    computer = CompiledComputer([3, 9, 1001, 9, 1, 9, 4, 9, 99, 0])
+    assert computer.run_until_blocked() == STATUS_INPUT
+    computer.inputs += [5]
+    assert computer.run_until_outputs(1) == STATUS_OUTPUT
+    assert computer.outputs == [6]
+    assert computer.run_until_blocked() == STATUS_HALT
+
+    # the self-modifying loop really ran compiled blocks
+    computer = CompiledComputer(programs[-2][0])
+    assert computer.process() == [105]
+    assert any(function is not None for function, end in computer.blocks.values())
+
+
+if __name__ == "__main__":
+    test()
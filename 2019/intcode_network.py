@@ -0,0 +1,226 @@
+"""
+Network of Intcode computers connected by channels, run on one asyncio loop.
+
+Each computer runs as a task with a single inbox channel. Whatever it outputs
+is sent to the inboxes of the computers it is connected to, so any layout of
+connections works, including fan-out, fan-in and cycles. Tasks only wake up
+when a value or free space arrives, so nothing busy-polls.
+"""
+
+import asyncio
+from collections import deque
+
+from intcode import STATUS_HALT, STATUS_INPUT, STATUS_OUTPUT, Computer
+
+# Values a channel holds before senders have to wait
+DEFAULT_CAPACITY = 64
+
+
+class Channel:
+    """A bounded first-in first-out queue of values between computers."""
+
+    def __init__(self, network, capacity):
+        self.network = network
+        self.capacity = capacity
+        self.values = deque()
+        self.getters = deque()  # futures of tasks waiting for a value
+        self.putters = deque()  # futures of tasks waiting for free space
+        self.closed = False
+
+    def __len__(self):
+        return len(self.values)
+
+    async def get(self):
+        """Return the next value, waiting until there is one."""
+        while not self.values:
+            await self.network.block(self.getters)
+        value = self.values.popleft()
+        self.network.wake(self.putters)
+        return value
+
+    async def put(self, value):
+        """Add a value, waiting until there is space for it.
+        Values sent to a closed channel are dropped.
+        """
+        while len(self.values) >= self.capacity and not self.closed:
+            await self.network.block(self.putters)
+        if self.closed:
+            return
+        self.values.append(value)
+        self.network.wake(self.getters)
+
+    def take(self):
+        """Remove and return every value waiting, without waiting for more."""
+        values = list(self.values)
+        self.values.clear()
+        while self.putters:
+            self.network.wake(self.putters)
+        return values
+
+    def close(self):
+        """Stop accepting values, releasing any tasks waiting to send."""
+        self.closed = True
+        while self.putters:
+            self.network.wake(self.putters)
+
+
+class Machine:
+    """One computer in a network, with its inbox and outgoing connections."""
+
+    def __init__(self, network, computer):
+        self.network = network
+        self.computer = computer
+        self.inbox = Channel(network, network.capacity)
+        self.targets = []  # inboxes that every output is sent to
+        self.outputs = []  # outputs of a machine with no targets
+        self.last_output = None
+
+    async def run(self):
+        """Run the computer until it halts, passing values through channels."""
+        computer = self.computer
+        while True:
+            # Hand over values already waiting, so the computer only stops
+            # for input when there really is none
+            if self.inbox.values and not computer.inputs:
+                computer.inputs += self.inbox.take()
+            status = computer.run_until_outputs(1)
+            if status == STATUS_OUTPUT:
+                value = computer.outputs.pop(0)
+                self.last_output = value
+                if not self.targets:
+                    self.outputs.append(value)
+                for target in self.targets:
+                    await target.put(value)
+            elif status == STATUS_INPUT:
+                computer.inputs.append(await self.inbox.get())
+            elif status == STATUS_HALT:
+                self.network.halted(self)
+                return
+
+
+class Network:
+    """Intcode computers connected by bounded channels.
+
+    Raises when every computer still running is waiting on a channel,
+    since none of them can ever wake the others.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.machines = []
+        self.running = 0  # machines that haven't halted
+        self.blocked = 0  # machines waiting on a channel
+
+    def add(self, computer, inputs=()):
+        """Add a computer (or a program to load into one) with some first
+        inputs. Returns its Machine.
+        """
+        if not isinstance(computer, Computer):
+            computer = Computer(computer)
+        computer.inputs += inputs
+        machine = Machine(self, computer)
+        self.machines.append(machine)
+        return machine
+
+    def connect(self, source, target):
+        """Send every output of the source machine to the target's inbox."""
+        source.targets.append(target.inbox)
+
+    def run(self):
+        """Run every machine until they have all halted."""
+        asyncio.run(self.run_async())
+
+    async def run_async(self):
+        """Run every machine on the current event loop until they all halt."""
+        self.running = len(self.machines)
+        self.blocked = 0
+        tasks = [asyncio.create_task(machine.run()) for machine in self.machines]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def block(self, waiters):
+        """Return a future for a task to wait on until it is woken."""
+        waiter = asyncio.get_running_loop().create_future()
+        waiters.append(waiter)
+        self.blocked += 1
+        self.check_deadlock()
+        return waiter
+
+    def wake(self, waiters):
+        """Wake the first task waiting in a queue of waiters, if any."""
+        # Counted here rather than when the task resumes, so a wake that is
+        # still on its way isn't mistaken for a deadlock
+        if waiters:
+            waiters.popleft().set_result(None)
+            self.blocked -= 1
+
+    def halted(self, machine):
+        """Note that a machine has halted, closing its inbox."""
+        self.running -= 1
+        machine.inbox.close()
+        self.check_deadlock()
+
+    def check_deadlock(self):
+        """Raise if every machine still running is waiting on a channel."""
+        if self.running and self.blocked == self.running:
+            raise Exception(f"network deadlocked with {self.blocked} machines waiting")
+
+
+def test():
+    # add each input to a running total and output it, until given 0
+    accumulate = [3, 17, 1006, 17, 14, 1, 17, 18, 18, 4, 18, 1105, 1, 0, 104, 0, 99]
+    accumulate += [0, 0]
+
+    # chain of adders, each passing its running totals to the next
+    network = Network(capacity=2)
+    source = network.add(accumulate, [1, 2, 3, 0])
+    chain = [source] + [network.add(accumulate) for _ in range(3)]
+    for machine, following in zip(chain, chain[1:]):
+        network.connect(machine, following)
+    network.run()
+    # totals 1, 3, 6, then 1, 4, 10, then 1, 5, 15, then 1, 6, 21
+    assert chain[-1].outputs == [1, 6, 21, 0]
+    assert all(machine.computer.halted for machine in chain)
+
+    # fan-out to two machines, and fan-in from both to a third
+    network = Network()
+    source = network.add([104, 5, 104, 7, 99])
+    left = network.add([3, 20, 102, 10, 20, 20, 4, 20, 1105, 1, 0] + [0] * 10)
+    right = network.add([3, 20, 1001, 20, 1, 20, 4, 20, 1105, 1, 0] + [0] * 10)
+    sink = network.add([3, 20, 4, 20, 1105, 1, 0] + [0] * 14)
+    for target in (left, right):
+        network.connect(source, target)
+        network.connect(target, sink)
+    try:
+        network.run()
+        assert False, "expected the machines left waiting to deadlock"
+    except Exception as error:
+        assert "deadlocked" in str(error)
+    assert sorted(sink.outputs) == [6, 8, 50, 70]
+
+    # cycle of two machines passing a value back and forth 10 times
+    bounce = [3, 20, 1001, 20, 1, 20, 4, 20, 1007, 20, 10, 21, 1005, 21, 0, 99]
+    network = Network()
+    first = network.add(bounce + [0] * 10, [0])
+    second = network.add(bounce + [0] * 10)
+    network.connect(first, second)
+    network.connect(second, first)
+    network.run()
+    assert (first.last_output, second.last_output) == (11, 10)
+
+    # many machines in one loop
+    network = Network()
+    chain = [network.add([3, 9, 1001, 9, 1, 9, 4, 9, 99, 0], [0])]
+    for _ in range(5000):
+        chain.append(network.add(chain[0].computer.fork()))
+        chain[-1].computer.inputs.clear()
+        network.connect(chain[-2], chain[-1])
+    network.run()
+    assert chain[-1].outputs == [5001]
+
+
+if __name__ == "__main__":
+    test()
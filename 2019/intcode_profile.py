@@ -0,0 +1,166 @@
+"""
+Profiler for Intcode programs.
+
+Counts each instruction (opcode and parameter modes), how often each
+instruction index runs, and how often each memory cell is read and written.
+
+Usage: python 2019/intcode_profile.py data/day9.txt [input...]
+"""
+
+from collections import Counter
+import json
+import sys
+import time
+
+from intcode import IMMEDIATE_MODE, PARAMETERS, Computer, Halt, decode
+from intcode_binary import load_program
+
+
+class Profiler:
+    """Records what an Intcode computer does while attached to it.
+
+    Attaching swaps in a counting `step` on that one computer, so computers
+    without a profiler attached run exactly as before.
+    """
+
+    def __init__(self):
+        self.computer = None
+        self.instructions = Counter()  # instruction (opcode and modes) -> runs
+        self.indexes = Counter()  # instruction index -> runs
+        self.reads = Counter()  # memory address -> reads of a parameter
+        self.writes = Counter()  # memory address -> writes of a result
+        self.wall_time = 0.0
+        self.started = None
+        self.fast_forward = None  # setting of the attached computer
+
+    def attach(self, computer):
+        """Start profiling a computer. Returns the profiler."""
+        if self.computer is not None:
+            raise Exception("profiler is already attached to a computer")
+        self.computer = computer
+        computer.step = self.step
+        # Every instruction is counted, so loops aren't skipped while attached
+        self.fast_forward = computer.fast_forward
+        computer.fast_forward = False
+        self.started = time.perf_counter()
+        return self
+
+    def detach(self):
+        """Stop profiling and restore the computer's own `step`."""
+        self.wall_time += time.perf_counter() - self.started
+        del self.computer.step
+        self.computer.fast_forward = self.fast_forward
+        self.computer = None
+
+    def step(self):
+        """Run and record a single instruction of the attached computer."""
+        computer = self.computer
+        index = computer.index
+        instruction = computer.get_value(index, IMMEDIATE_MODE)
+        opcode, *modes = decode(instruction)
+        reads, writes = PARAMETERS.get(opcode, (0, 0))
+
+        # Addresses depend on the state before the instruction runs
+        read_addresses = [
+            computer.get_address(index + 1 + param, modes[param])
+            for param in range(reads)
+            if modes[param] != IMMEDIATE_MODE
+        ]
+        write_addresses = [
+            computer.get_address(index + 1 + param, modes[param])
+            for param in range(reads, reads + writes)
+        ]
+
+        # Always interpret single instructions, even on compiled computers
+        try:
+            Computer.step(computer)
+        except Halt:
+            self.record(index, instruction % 100000, read_addresses, [])
+            raise
+        self.record(index, instruction % 100000, read_addresses, write_addresses)
+
+    def record(self, index, instruction, read_addresses, write_addresses):
+        """Count one instruction that ran."""
+        self.instructions[instruction] += 1
+        self.indexes[index] += 1
+        self.reads.update(read_addresses)
+        self.writes.update(write_addresses)
+
+    def elapsed(self):
+        """Return seconds spent attached, including any current attachment."""
+        if self.computer is None:
+            return self.wall_time
+        return self.wall_time + time.perf_counter() - self.started
+
+    def results(self):
+        """Return all counters as a JSON-compatible dict."""
+        return {
+            "wall_time": self.elapsed(),
+            "total_instructions": sum(self.instructions.values()),
+            "instructions": {str(k): v for k, v in self.instructions.most_common()},
+            "indexes": {str(k): v for k, v in self.indexes.most_common()},
+            "reads": {str(k): v for k, v in self.reads.most_common()},
+            "writes": {str(k): v for k, v in self.writes.most_common()},
+        }
+
+    def to_json(self, path=None):
+        """Return the results as JSON text, also writing it to `path` if given."""
+        text = json.dumps(self.results(), indent=2)
+        if path is not None:
+            with open(path, "w") as file:
+                file.write(text)
+        return text
+
+    def report(self, top=10):
+        """Return a text report of the `top` entries of each counter."""
+        total = sum(self.instructions.values())
+        lines = [f"{total} instructions in {self.elapsed():.3f}s"]
+        sections = [
+            ("instruction", self.instructions),
+            ("index", self.indexes),
+            ("reads of address", self.reads),
+            ("writes of address", self.writes),
+        ]
+        for label, counter in sections:
+            lines.append("")
+            lines.append(f"{'count':>12}  {label}")
+            for key, count in counter.most_common(top):
+                lines.append(f"{count:>12}  {key}")
+        return "\n".join(lines)
+
+
+def test():
+    # count down from 3, outputting each number
+    program = [1101, 3, 0, 20, 4, 20, 1001, 20, -1, 20, 1005, 20, 4, 99]
+    computer = Computer(program)
+    profiler = Profiler().attach(computer)
+    assert computer.process() == [3, 2, 1]
+    profiler.detach()
+    assert "step" not in vars(computer)
+
+    assert profiler.instructions == {1101: 1, 4: 3, 1001: 3, 1005: 3, 99: 1}
+    assert profiler.indexes[4] == profiler.indexes[10] == 3
+    assert profiler.reads == {20: 9}
+    assert profiler.writes == {20: 4}
+    results = json.loads(profiler.to_json())
+    assert results["total_instructions"] == 11
+    assert results["writes"] == {"20": 4}
+    assert profiler.report().startswith("11 instructions")
+
+
+def main(path, inputs):
+    """Profile a program file run with some inputs and print the report."""
+    computer = Computer(load_program(path))
+    computer.inputs += inputs
+    profiler = Profiler().attach(computer)
+    outputs = computer.process()
+    profiler.detach()
+    print(f"outputs: {outputs}")
+    print(f"decoded cache hit rate: {computer.cache_hit_rate():.1%}")
+    print(profiler.report())
+
+
+if __name__ == "__main__":
+    test()
+    if len(sys.argv) > 1:
+        main(sys.argv[1], [int(value) for value in sys.argv[2:]])
@@ -0,0 +1,338 @@
+"""
+Execution trace of the last instructions an Intcode computer ran.
+
+A Tracer keeps a ring buffer of the last `size` instructions with the
+values they read and wrote, in a list allocated once when it is created.
+Every `size` instructions it also takes a snapshot, so a dumped Trace can be
+run again from the snapshot before its first record and checked against
+what was recorded, to find where a run first went differently.
+
+Usage: python 2019/intcode_trace.py data/day9.txt [input...]
+"""
+
+import os
+import sys
+import tempfile
+
+from intcode import PARAMETERS, Computer, Halt, NeedInput
+from intcode_binary import load_program
+from intcode_checkpoint import load_checkpoint, save_checkpoint
+from intcode_disasm import MNEMONICS
+
+# Fields of a record: step, index, instruction, relative base before it ran,
+# the values of its first two parameters (0 if unused), the address it
+# wrote (-1 if none) and the value written there
+FIELDS = 8
+NO_ADDRESS = -1
+
+
+class Tracer:
+    """Records what an Intcode computer does while attached to it.
+
+    Like the profiler, attaching swaps in a recording `step` on that one
+    computer, which interprets single instructions and never skips loops.
+    On an error other than Halt or NeedInput, the trace so far is kept as
+    `crash`, and saved to `path` if one was given.
+    """
+
+    def __init__(self, size=4096, path=None, snapshots=True):
+        self.size = size
+        self.path = path
+        # Without snapshots a dumped trace can be read but not replayed
+        self.snapshots = snapshots
+        # Records of the last `size` instructions, oldest overwritten first
+        self.records = [0] * (size * FIELDS)
+        self.steps = 0  # instructions recorded since attaching
+        # The last two [(step, snapshot, inputs consumed before it)]
+        self.checkpoints = []
+        self.inputs = []  # inputs consumed since the oldest checkpoint
+        self.consumed = 0  # inputs consumed before the oldest checkpoint
+        self.computer = None
+        self.fast_forward = None  # setting of the attached computer
+        self.crash = None
+
+    def attach(self, computer):
+        """Start tracing a computer. Returns the tracer."""
+        if self.computer is not None:
+            raise Exception("tracer is already attached to a computer")
+        self.computer = computer
+        computer.step = self.step
+        self.fast_forward = computer.fast_forward
+        computer.fast_forward = False
+        return self
+
+    def detach(self):
+        """Stop tracing and restore the computer's own `step`."""
+        del self.computer.step
+        self.computer.fast_forward = self.fast_forward
+        self.computer = None
+
+    def step(self):
+        """Run and record a single instruction of the attached computer."""
+        computer = self.computer
+        steps = self.steps
+        if steps % self.size == 0 and self.snapshots:
+            self.checkpoint()
+
+        # Parameters are read before the instruction can change them
+        index = computer.index
+        instruction = computer.memory.read(index)
+        opcode = instruction % 100
+        reads, writes = PARAMETERS.get(opcode, (0, 0))
+        records = self.records
+        position = steps % self.size * FIELDS
+        records[position] = steps
+        records[position + 1] = index
+        records[position + 2] = instruction
+        records[position + 3] = computer.relative_base
+        records[position + 4] = 0
+        records[position + 5] = 0
+        records[position + 6] = NO_ADDRESS
+        records[position + 7] = 0
+        try:
+            if reads:
+                mode = instruction // 100 % 10
+                records[position + 4] = computer.get_value(index + 1, mode)
+            if reads > 1:
+                mode = instruction // 1000 % 10
+                records[position + 5] = computer.get_value(index + 2, mode)
+            if writes:
+                mode = instruction // 10 ** (reads + 2) % 10
+                records[position + 6] = computer.get_address(index + 1 + reads, mode)
+            Computer.step(computer)
+        except NeedInput:
+            # Nothing ran, so the record is left to be overwritten
+            raise
+        except Halt:
+            self.steps += 1
+            raise
+        except Exception:
+            self.steps += 1
+            self.crash = self.dump()
+            if self.path is not None:
+                self.crash.save(self.path)
+            raise
+
+        if writes:
+            written = computer.memory.read(records[position + 6])
+            records[position + 7] = written
+            if opcode == 3:
+                self.inputs.append(written)
+        self.steps += 1
+
+    def checkpoint(self):
+        """Take a snapshot to replay from, keeping only the last two."""
+        computer = self.computer
+        consumed = self.consumed + len(self.inputs)
+        self.checkpoints.append((self.steps, computer.snapshot(), consumed))
+        if len(self.checkpoints) > 2:
+            self.checkpoints.pop(0)
+            dropped = self.checkpoints[0][2] - self.consumed
+            self.inputs = self.inputs[dropped:]
+            self.consumed = self.checkpoints[0][2]
+
+    def dump(self):
+        """Return a Trace of the instructions recorded so far."""
+        first = max(0, self.steps - self.size)
+        records = []
+        for step in range(first, self.steps):
+            position = step % self.size * FIELDS
+            records.append(tuple(self.records[position : position + FIELDS]))
+        if not self.checkpoints:
+            return Trace(first, None, [], records)
+        start, snapshot, _ = self.checkpoints[0]
+        return Trace(start, snapshot, list(self.inputs), records)
+
+
+class Trace:
+    """Records of the last instructions a computer ran, and a snapshot from
+    at or before the first of them to run them again from.
+    """
+
+    def __init__(self, start, snapshot, inputs, records):
+        self.start = start  # step the snapshot was taken at
+        self.snapshot = snapshot
+        self.inputs = inputs  # inputs consumed from the snapshot on
+        self.records = records  # tuples of FIELDS values, oldest first
+
+    def computer_at(self, step, computer_class=Computer):
+        """Return a computer replayed from the snapshot up to just before a
+        step, to look at or to bisect between.
+        """
+        if self.snapshot is None:
+            raise Exception("trace has no snapshot to replay from")
+        computer = computer_class.from_snapshot(self.snapshot)
+        computer.inputs = list(self.inputs)
+        computer.fast_forward = False
+        for _ in range(self.start, step):
+            Computer.step(computer)
+        return computer
+
+    def verify(self, computer_class=Computer):
+        """Replay the trace and return (step, recorded, replayed) for the
+        first instruction that ran differently, or None if all matched.
+        The replayed record is the error raised if replaying failed.
+        """
+        if not self.records:
+            return None
+        first = self.records[0][0]
+        computer = self.computer_at(first, computer_class)
+        tracer = Tracer(size=1, snapshots=False)
+        tracer.steps = first
+        tracer.attach(computer)
+        for recorded in self.records:
+            try:
+                computer.step()
+            except Halt:
+                pass
+            except Exception as error:
+                return recorded[0], recorded, error
+            replayed = tuple(tracer.records)
+            if replayed != recorded:
+                return recorded[0], recorded, replayed
+        return None
+
+    def save(self, path):
+        """Save the trace and its snapshot to a checkpoint file. A trace
+        without a snapshot is saved with an empty computer in its place, and
+        can be read but not replayed once loaded.
+        """
+        if self.snapshot is None:
+            computer = Computer([])
+        else:
+            computer = Computer.from_snapshot(self.snapshot)
+        state = {
+            "start": self.start,
+            "inputs": self.inputs,
+            "records": self.records,
+            "replayable": self.snapshot is not None,
+        }
+        save_checkpoint(path, computer, state)
+
+    def format(self):
+        """Return the records as text, one instruction a line."""
+        lines = []
+        for (
+            step,
+            index,
+            instruction,
+            base,
+            value1,
+            value2,
+            address,
+            written,
+        ) in self.records:
+            mnemonic = MNEMONICS.get(instruction % 100, "???")
+            line = f"{step:>10} {index:>8} {mnemonic:<4} {instruction:>6} rb={base}"
+            reads, writes = PARAMETERS.get(instruction % 100, (0, 0))
+            values = [value1, value2][:reads]
+            if values:
+                line += " " + ", ".join(map(str, values))
+            if address != NO_ADDRESS:
+                line += f" -> [{address}] = {written}"
+            lines.append(line)
+        return "\n".join(lines)
+
+
+def load_trace(path):
+    """Return a Trace saved to a checkpoint file."""
+    computer, state = load_checkpoint(path)
+    records = [tuple(record) for record in state["records"]]
+    snapshot = computer.snapshot() if state["replayable"] else None
+    return Trace(state["start"], snapshot, state["inputs"], records)
+
+
+def test():
+    # count down from 3, outputting each number
+    program = [1101, 3, 0, 20, 4, 20, 1001, 20, -1, 20, 1005, 20, 4, 99]
+    computer = Computer(program)
+    tracer = Tracer(size=4).attach(computer)
+    assert computer.process() == [3, 2, 1]
+    tracer.detach()
+    assert "step" not in vars(computer) and computer.fast_forward
+
+    trace = tracer.dump()
+    # only the last 4 of the 11 instructions are kept
+    assert trace.records == [
+        (7, 4, 4, 0, 1, 0, -1, 0),
+        (8, 6, 1001, 0, 1, -1, 20, 0),
+        (9, 10, 1005, 0, 0, 4, -1, 0),
+        (10, 13, 99, 0, 0, 0, -1, 0),
+    ]
+    assert trace.start == 4 and trace.verify() is None
+    assert trace.computer_at(9).memory[20] == 0
+    assert (
+        trace.format().splitlines()[1]
+        == "         8        6 add    1001 rb=0 1, -1 -> [20] = 0"
+    )
+
+    # inputs are kept from the snapshot on, and replayed the same
+    program = [3, 20, 1001, 20, 5, 20, 4, 20, 1105, 1, 0] + [0] * 10
+    computer = Computer(program)
+    tracer = Tracer(size=5).attach(computer)
+    for value in range(10):
+        computer.inputs += [value]
+        computer.run_until_outputs(len(computer.outputs) + 1)
+    trace = tracer.dump()
+    # snapshots every 5 of the 39 steps, the last two at 30 and 35
+    assert trace.inputs == [8, 9] and trace.start == 30
+    assert trace.verify() is None
+
+    # a changed snapshot makes the replay go differently at the first use
+    trace.snapshot.memory[4] = 6
+    step, recorded, replayed = trace.verify()
+    assert step == recorded[0] == replayed[0] == 34
+    assert (recorded[4], replayed[4]) == (13, 14)
+
+    # errors dump the trace, and a saved trace loads and replays the same
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "trace.ckpt")
+        computer = Computer([1101, 2, 3, 7, 1105, 1, -2, 0])
+        tracer = Tracer(path=path).attach(computer)
+        try:
+            computer.process()
+            assert False, "expected a jump to a negative address"
+        except Exception as error:
+            assert "negative" in str(error)
+        assert [record[1] for record in tracer.crash.records] == [0, 4]
+        loaded = load_trace(path)
+        assert loaded.records == tracer.crash.records
+        assert loaded.snapshot.memory[7] == 0
+        step, recorded, error = loaded.verify()
+        assert step == 1 and "negative" in str(error)
+
+        # without snapshots the crash is still dumped, only not replayable
+        computer = Computer([1101, 2, 3, 7, 1105, 1, -2, 0])
+        tracer = Tracer(path=path, snapshots=False).attach(computer)
+        try:
+            computer.process()
+            assert False, "expected a jump to a negative address"
+        except Exception as error:
+            assert "negative" in str(error)
+        loaded = load_trace(path)
+        assert loaded.snapshot is None
+        assert loaded.records == tracer.crash.records
+        try:
+            loaded.verify()
+            assert False, "expected no snapshot to replay from"
+        except Exception as error:
+            assert "no snapshot" in str(error)
+
+
+def main(path, inputs):
+    """Run a program file with some inputs and print its last instructions."""
+    computer = Computer(load_program(path))
+    computer.inputs += inputs
+    tracer = Tracer().attach(computer)
+    outputs = computer.process()
+    tracer.detach()
+    trace = tracer.dump()
+    print(f"outputs: {outputs}")
+    print(trace.format())
+    print(f"replay {'matches' if trace.verify() is None else 'differs'}")
+
+
+if __name__ == "__main__":
+    test()
+    if len(sys.argv) > 1:
+        main(sys.argv[1], [int(value) for value in sys.argv[2:]])
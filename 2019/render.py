@@ -0,0 +1,204 @@
+"""
+Rendering of grids stored as bytearrays of rows, to text and Netpbm images.
+
+A grid is cropped to its bounds in one copy per row, with the top row (the
+largest y) first, then every cell is mapped through a 256-entry table with
+bytes.translate. So rendering costs a few passes in C over the grid's area,
+without making a Python object per cell.
+
+Grids need `cells`, `left`, `bottom` and `width` for the area stored, and
+`bounds` of (min_x, min_y, max_x, max_y) for the area to draw, like the
+day 11 PanelGrid and the day 13 TileGrid.
+"""
+
+import os
+import tempfile
+
+# Image formats by file extension
+FORMATS = {".pbm": "pbm", ".pgm": "pgm", ".ppm": "ppm", ".txt": "text"}
+
+
+class Image:
+    """Cell values of a cropped grid, one row after another from the top."""
+
+    def __init__(self, width, height, data):
+        self.width = width
+        self.height = height
+        self.data = data
+
+
+def crop(grid):
+    """Return an Image of a grid within its bounds, flipping Y so the top row
+    is the largest y.
+    """
+    if grid.bounds is None:
+        return Image(0, 0, b"")
+    min_x, min_y, max_x, max_y = grid.bounds
+    width = max_x - min_x + 1
+    height = max_y - min_y + 1
+    data = bytearray(width * height)
+    for row, y in enumerate(range(max_y, min_y - 1, -1)):
+        start = (y - grid.bottom) * grid.width + min_x - grid.left
+        data[row * width : (row + 1) * width] = grid.cells[start : start + width]
+    return Image(width, height, data)
+
+
+def table(mapping, default=0):
+    """Return a translation table of every byte value to the byte a mapping
+    gives it, or to `default`.
+    """
+    return bytes(mapping.get(value, default) for value in range(256))
+
+
+def to_text(image, icons):
+    """Return an Image as one block of text, drawing each value as the
+    character icons maps it to.
+    """
+    codes = {value: ord(icon) for value, icon in icons.items()}
+    drawn = image.data.translate(table(codes, ord("?")))
+    # Each row is followed by a newline, filled in with one strided write
+    width = image.width
+    text = bytearray((width + 1) * image.height)
+    for row in range(image.height):
+        text[row * (width + 1) : row * (width + 1) + width] = drawn[
+            row * width : (row + 1) * width
+        ]
+    text[width :: width + 1] = b"\n" * image.height
+    return text[:-1].decode("latin-1")
+
+
+def to_pbm(image, ink):
+    """Return an Image as a binary PBM, drawing the values in `ink` black."""
+    bits = image.data.translate(table({value: ord("1") for value in ink}, ord("0")))
+    # Rows are packed into whole bytes, padded with white
+    padding = b"0" * (-image.width % 8)
+    row_bytes = (image.width + 7) // 8
+    rows = []
+    for row in range(image.height):
+        row_bits = bits[row * image.width : (row + 1) * image.width] + padding
+        rows.append(int(row_bits or b"0", 2).to_bytes(row_bytes, "big"))
+    return b"P4\n%d %d\n" % (image.width, image.height) + b"".join(rows)
+
+
+def to_pgm(image, levels):
+    """Return an Image as a binary PGM, with each value the gray level
+    (0 to 255) that levels maps it to.
+    """
+    header = b"P5\n%d %d\n255\n" % (image.width, image.height)
+    return header + image.data.translate(table(levels))
+
+
+def to_ppm(image, colors):
+    """Return an Image as a binary PPM, with each value the (red, green,
+    blue) color that colors maps it to.
+    """
+    header = b"P6\n%d %d\n255\n" % (image.width, image.height)
+    pixels = bytearray(3 * len(image.data))
+    for channel in range(3):
+        levels = {value: color[channel] for value, color in colors.items()}
+        pixels[channel::3] = image.data.translate(table(levels))
+    return header + pixels
+
+
+def encode(image, format, palette):
+    """Return an Image in a format ("text", "pbm", "pgm" or "ppm") with a
+    palette fitting it: icons, ink, levels or colors.
+    """
+    if format == "text":
+        return to_text(image, palette).encode("latin-1") + b"\n"
+    if format == "pbm":
+        return to_pbm(image, palette)
+    if format == "pgm":
+        return to_pgm(image, palette)
+    if format == "ppm":
+        return to_ppm(image, palette)
+    raise Exception(f"unknown image format: {format}")
+
+
+def format_of(path):
+    """Return the image format for a path by its extension."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS:
+        raise Exception(f"unknown image extension: {path}")
+    return FORMATS[extension]
+
+
+def write_image(path, image, palette):
+    """Write an Image to a file in the format of its extension."""
+    with open(path, "wb") as file:
+        file.write(encode(image, format_of(path), palette))
+
+
+class FrameWriter:
+    """Streams frames to one file as they are drawn, each a whole image in
+    the format of the file's extension one after another. Streams of PPM
+    frames can be read by video tools as an image pipe.
+    """
+
+    def __init__(self, path, palette):
+        self.path = path
+        self.format = format_of(path)
+        self.palette = palette
+        self.file = open(path, "wb")
+        self.frames = 0
+
+    def write(self, image):
+        """Add an Image as the next frame."""
+        self.file.write(encode(image, self.format, self.palette))
+        self.frames += 1
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def test():
+    class Grid:
+        # cells of 4 x 3 stored from (-1, -1), with (0, 0) to (2, 1) drawn
+        cells = bytearray([0, 0, 0, 0, 0, 1, 2, 0, 0, 0, 3, 1])
+        left, bottom, width = -1, -1, 4
+        bounds = (0, 0, 2, 1)
+
+    image = crop(Grid)
+    assert (image.width, image.height) == (3, 2)
+    assert bytes(image.data) == bytes([0, 3, 1, 1, 2, 0])
+    assert to_text(image, {0: " ", 1: "#", 2: "x"}) == " ?#\n#x "
+
+    assert to_pbm(image, {1, 3}) == b"P4\n3 2\n" + bytes([0b01100000, 0b10000000])
+    assert to_pgm(image, {1: 255, 2: 128}) == b"P5\n3 2\n255\n" + bytes(
+        [0, 0, 255, 255, 128, 0]
+    )
+    colors = {1: (255, 0, 0), 3: (0, 0, 9)}
+    assert to_ppm(image, colors)[-18:] == bytes(
+        [0, 0, 0, 0, 0, 9, 255, 0, 0, 255, 0, 0, 0, 0, 0, 0, 0, 0]
+    )
+
+    class Empty:
+        bounds = None
+
+    assert to_text(crop(Empty), {}) == ""
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "grid.pgm")
+        write_image(path, image, {1: 255})
+        with open(path, "rb") as file:
+            assert file.read() == to_pgm(image, {1: 255})
+
+        # frames are written one after another as they come
+        path = os.path.join(folder, "frames.txt")
+        with FrameWriter(path, {0: ".", 1: "#", 2: "x", 3: "o"}) as frames:
+            frames.write(image)
+            Grid.cells[5] = 2
+            frames.write(crop(Grid))
+        with open(path) as file:
+            assert file.read() == ".o#\n#x.\n.o#\nxx.\n"
+        assert frames.frames == 2
+
+
+if __name__ == "__main__":
+    test()